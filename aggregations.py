@@ -0,0 +1,858 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Dimensi cube = semua kolom yang dipakai filter dan rollup di dashboard
+CUBE_KEYS = ['tahun', 'time_period', 'nama_state', 'product_category_name_english']
+
+# Measure aditif, aman dijumlahkan lintas cell
+CUBE_MEASURES = [
+    'revenue',
+    'row_count',
+    'review_sum',
+    'review_count',
+    'positive_count',
+    'negative_count',
+    'zero_count'
+]
+
+# Aggregate bulanan untuk trend: bulan plus dimensi filter dan split (state, kategori)
+MONTHLY_KEYS = ['tahun', 'bulan', 'time_period', 'nama_state', 'product_category_name_english']
+MONTHLY_MEASURES = ['revenue', 'review_sum', 'review_count', 'order_count', 'category_order_count']
+
+
+def _key_codes(series):
+    """Kode integer untuk satu kolom key (-1 untuk NaN)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy()
+    codes, _ = pd.factorize(series, sort=True)
+    return codes
+
+
+def _decode_key(series, codes):
+    """Kembalikan kode key menjadi nilai aslinya"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(codes, dtype=series.dtype)
+    uniques = np.sort(series.dropna().unique())
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+        # Mis. ID Int64 nullable: kode -1 jadi <NA>, nilai int64 tidak lewat float
+        return pd.array(uniques, dtype=series.dtype).take(codes, allow_fill=True)
+    values = pd.Series(uniques).reindex(codes).to_numpy()
+    if not series.isna().any():
+        values = values.astype(series.dtype)
+    return values
+
+
+def _align_categories(frames, keys):
+    """Samakan categories kolom key kategorikal antar frame supaya hasil concat tetap categorical"""
+    for key in keys:
+        dtypes = [frame[key].dtype for frame in frames]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        if all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+        categories = pd.Index(sorted(set().union(*(dtype.categories for dtype in dtypes))))
+        dtype = pd.CategoricalDtype(categories)
+        frames = [frame.assign(**{key: frame[key].astype(dtype)}) for frame in frames]
+    return frames
+
+
+def combine_partials(partials, keys, aggs):
+    """Gabungkan tabel aggregate parsial (misalnya hasil per chunk) menjadi satu baris per key.
+
+    aggs berisi kolom -> fungsi aggregate ('sum', 'min', ...). Key NaN tetap
+    disimpan, sama seperti cell cube.
+    """
+    combined = pd.concat(_align_categories(partials, keys), ignore_index=True)
+    codes = [_key_codes(combined[key]) for key in keys]
+    grouped = combined[list(aggs)].groupby(codes, sort=True).agg(aggs)
+
+    result = pd.DataFrame({
+        key: _decode_key(combined[key], grouped.index.get_level_values(i).to_numpy())
+        for i, key in enumerate(keys)
+    })
+    for col in aggs:
+        result[col] = grouped[col].to_numpy()
+    return result
+
+
+def cube_keys(df):
+    """Key cube yang tersedia di frame (kategori produk bisa tidak ada)"""
+    return [key for key in CUBE_KEYS if key in df.columns]
+
+
+def monthly_keys(df):
+    """Key aggregate bulanan yang tersedia di frame"""
+    return [key for key in MONTHLY_KEYS if key in df.columns]
+
+
+def aggregate_cells(df, keys, measures):
+    """Jumlahkan frame measures per kombinasi key df, satu baris per cell"""
+    # Group di kode integer supaya key NaN ikut ter-aggregate
+    codes = [_key_codes(df[key]) for key in keys]
+    grouped = measures.groupby(codes, sort=True).sum()
+
+    cells = pd.DataFrame({
+        key: _decode_key(df[key], grouped.index.get_level_values(i).to_numpy())
+        for i, key in enumerate(keys)
+    })
+    for col in measures.columns:
+        cells[col] = grouped[col].to_numpy()
+    return cells
+
+
+def build_cube(df):
+    """Pre-aggregate frame per (tahun, time_period, nama_state, kategori produk).
+
+    Setiap cell menyimpan measure aditif. Cell dengan key NaN tetap disimpan
+    supaya total keseluruhan sama dengan total frame mentah.
+    """
+    score = df['review_score']
+    valid = score > 0
+
+    measures = pd.DataFrame({
+        'revenue': df['price'].astype('float64').to_numpy(),
+        'row_count': np.ones(len(df), dtype='int64'),
+        'review_sum': score.where(valid, 0).astype('float64').to_numpy(),
+        'review_count': valid.to_numpy(dtype='int64'),
+        'positive_count': (score >= 4).to_numpy(dtype='int64'),
+        'negative_count': (score <= 2).to_numpy(dtype='int64'),
+        'zero_count': (score == 0).to_numpy(dtype='int64')
+    })
+    return aggregate_cells(df, cube_keys(df), measures)
+
+
+def first_orders(chunk, keys, known=None):
+    """1 untuk kemunculan pertama setiap order per key, selain itu 0.
+
+    Order kosong dan order yang sudah dihitung di chunk atau append
+    sebelumnya (known) tidak dihitung lagi.
+    """
+    first = ~chunk.duplicated(keys + ['order_id']) & chunk['order_id'].notna()
+    if known is not None:
+        first &= ~known
+    return first.to_numpy(dtype='int64')
+
+
+def build_monthly_cube(df, known=None):
+    """Pre-aggregate frame per (tahun, bulan, time_period, nama_state, kategori produk) untuk trend.
+
+    order_count menghitung setiap order sekali per (bulan, periode waktu, state)
+    dan category_order_count sekali per (bulan, periode waktu, kategori), jadi
+    jumlahnya tidak bergantung urutan baris dan sama dengan order unik per
+    bulan selama order tidak tersebar ke beberapa periode/state dalam satu
+    bulan. known menandai order yang sudah dihitung sebelumnya (append streaming).
+    """
+    month_keys = [key for key in ['tahun', 'bulan', 'time_period'] if key in df.columns]
+    state = [key for key in ['nama_state'] if key in df.columns]
+    category = [key for key in ['product_category_name_english'] if key in df.columns]
+    score = df['review_score']
+    valid = score > 0
+
+    measures = pd.DataFrame({
+        'revenue': df['price'].astype('float64').to_numpy(),
+        'review_sum': score.where(valid, 0).astype('float64').to_numpy(),
+        'review_count': valid.to_numpy(dtype='int64'),
+        'order_count': first_orders(df, month_keys + state, known),
+        'category_order_count': first_orders(df, month_keys + category, known)
+    })
+    return aggregate_cells(df, monthly_keys(df), measures)
+
+
+def filter_cells(cube, selected_year, selected_time_period):
+    """Pilih cell cube sesuai filter tahun dan periode waktu"""
+    mask = np.ones(len(cube), dtype=bool)
+    if selected_year != 'All Time':
+        mask &= (cube['tahun'] == selected_year).to_numpy()
+    if selected_time_period:
+        mask &= cube['time_period'].isin(selected_time_period).to_numpy()
+    return cube[mask]
+
+
+def rollup(cells, by=None):
+    """Rollup measure cube, total keseluruhan atau per satu dimensi"""
+    if by is None:
+        # dtype object supaya count tetap integer
+        return pd.Series({col: cells[col].sum() for col in CUBE_MEASURES}, dtype=object)
+    return cells.groupby(by, observed=True)[CUBE_MEASURES].sum()
+
+
+def average_review(measures):
+    """Rata-rata review score (hanya score > 0) dari measure hasil rollup"""
+    if isinstance(measures, pd.DataFrame):
+        return measures['review_sum'] / measures['review_count'].where(measures['review_count'] > 0)
+    if measures['review_count'] > 0:
+        return measures['review_sum'] / measures['review_count']
+    return float('nan')
+
+
+def _positions_by(series):
+    """Posisi baris (terurut) untuk setiap nilai kolom"""
+    return series.groupby(series, observed=True).indices
+
+
+class PartitionIndex:
+    """Posisi baris per tahun dan per time_period, dibangun sekali per versi dataset.
+
+    Filter dashboard cukup menggabungkan array posisi ini, tanpa mask ulang
+    atau copy seluruh frame setiap rerun.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.year_positions = _positions_by(df['tahun'])
+        self.period_positions = _positions_by(df['time_period'])
+
+    @classmethod
+    def from_positions(cls, n_rows, year_positions, period_positions):
+        """Index dari array posisi yang sudah ada (mis. memory-mapped), tanpa membaca frame"""
+        index = cls.__new__(cls)
+        index.n_rows = n_rows
+        index.year_positions = year_positions
+        index.period_positions = period_positions
+        return index
+
+    def _mark(self, arrays):
+        """Mask boolean dari gabungan beberapa array posisi"""
+        marked = np.zeros(self.n_rows, dtype=bool)
+        for positions in arrays:
+            marked[positions] = True
+        return marked
+
+    def select(self, selected_year, selected_time_period, rows=None):
+        """Posisi baris terurut untuk filter, None kalau semua baris terpilih.
+
+        rows (slice dari TimeIndex) membatasi hasil ke rentang baris kontigu;
+        tanpa filter lain slice itu sendiri yang dikembalikan (tanpa copy).
+        """
+        positions = None
+        if selected_year != 'All Time':
+            positions = self.year_positions.get(selected_year, np.array([], dtype=np.intp))
+
+        if selected_time_period:
+            period_arrays = [self.period_positions[period] for period in selected_time_period
+                             if period in self.period_positions]
+            in_periods = self._mark(period_arrays)
+            if positions is None:
+                positions = np.flatnonzero(in_periods)
+            else:
+                # Intersection: tahun sudah terurut, cukup cek mask periode
+                positions = positions[in_periods[positions]]
+
+        if rows is not None:
+            if positions is None:
+                positions = rows
+            else:
+                # Posisi terurut: batas slice cukup dicari dengan binary search
+                start, stop = np.searchsorted(positions, [rows.start, rows.stop])
+                positions = positions[start:stop]
+
+        if positions is not None and selected_count(positions) == self.n_rows:
+            return None
+        return positions
+
+
+def selected_count(positions):
+    """Jumlah baris dari hasil PartitionIndex.select (array posisi atau slice)"""
+    if isinstance(positions, slice):
+        return positions.stop - positions.start
+    return len(positions)
+
+
+class TimeIndex:
+    """Index binary search untuk frame yang terurut per timestamp (NaT di akhir).
+
+    Filter rentang tanggal cukup dua searchsorted dan menghasilkan slice
+    baris kontigu. Batas setiap bulan dihitung sekali saat index dibangun,
+    jadi filter dan rollup bulanan tidak perlu scan ulang.
+    """
+
+    def __init__(self, timestamps):
+        values = timestamps.to_numpy()
+        valid = ~np.isnat(values)
+        self.n_valid = int(valid.sum())
+        self.values = values[:self.n_valid]
+        if not valid[:self.n_valid].all() or (self.values[1:] < self.values[:-1]).any():
+            raise ValueError("Frame harus terurut per order_purchase_timestamp (lihat sort_by_time)")
+
+        months = self.values.astype('datetime64[M]')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        self.months = months[starts]
+        self.month_bounds = np.append(starts, self.n_valid)
+
+    def _position(self, timestamp):
+        value = np.datetime64(pd.Timestamp(timestamp)).astype(self.values.dtype)
+        return int(np.searchsorted(self.values, value, side='left'))
+
+    def slice(self, start=None, end=None):
+        """Baris dengan start <= timestamp < end (None = tanpa batas, NaT tidak ikut)"""
+        lo = 0 if start is None else self._position(start)
+        hi = self.n_valid if end is None else self._position(end)
+        return slice(lo, max(lo, hi))
+
+    def month_slice(self, month):
+        """Baris satu bulan (mis. '2017-03') langsung dari batas bulan"""
+        month = np.datetime64(month, 'M')
+        i = int(np.searchsorted(self.months, month))
+        if i == len(self.months) or self.months[i] != month:
+            return slice(0, 0)
+        return slice(int(self.month_bounds[i]), int(self.month_bounds[i + 1]))
+
+    def monthly_sum(self, values):
+        """Total values per bulan (urut self.months) dalam satu pass reduceat"""
+        values = np.asarray(values)[:self.n_valid]
+        if not len(self.months):
+            return values[:0]
+        return np.add.reduceat(values, self.month_bounds[:-1])
+
+    def months_in_year(self, year):
+        """Nomor bulan (1-12) yang punya data di satu tahun"""
+        months = self.months[self.months.astype('datetime64[Y]') == np.datetime64(int(year) - 1970, 'Y')]
+        # datetime64[M] = jumlah bulan sejak 1970-01
+        return (months.astype(np.int64) % 12 + 1).tolist()
+
+    def date_range(self, start=None, end=None):
+        """Tanggal pertama dan terakhir yang punya timestamp di [start, end) (None = tanpa batas)"""
+        rows = self.slice(start, end)
+        if rows.start == rows.stop:
+            return None
+        return pd.Timestamp(self.values[rows.start]).date(), pd.Timestamp(self.values[rows.stop - 1]).date()
+
+
+def time_bounds(selected_year, selected_month=None, date_range=None):
+    """Batas [start, end) timestamp dari filter bulan dan rentang tanggal, None kalau tidak dibatasi.
+
+    Tahun tetap difilter lewat PartitionIndex; bulan hanya berlaku kalau
+    tahun dipilih. date_range inklusif (tanggal awal, tanggal akhir).
+    """
+    start = end = None
+    if selected_month and selected_year != 'All Time':
+        start = pd.Timestamp(year=int(selected_year), month=selected_month, day=1)
+        end = start + pd.DateOffset(months=1)
+    if date_range is not None:
+        range_start = pd.Timestamp(date_range[0])
+        range_end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+        start = range_start if start is None else max(start, range_start)
+        end = range_end if end is None else min(end, range_end)
+    if start is None:
+        return None
+    return start, max(start, end)
+
+
+def select_rows(df, positions):
+    """Frame hasil filter: frame asli tanpa copy kalau semua baris terpilih"""
+    if positions is None:
+        return df
+    if isinstance(positions, slice):
+        # Rentang kontigu dari TimeIndex: view, tanpa copy
+        return df.iloc[positions]
+    return df.take(positions)
+
+
+def estimate_nbytes(obj):
+    """Perkiraan ukuran hasil komputasi di memory (bytes)"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(item) for item in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(item) for item in obj.values())
+    if hasattr(obj, 'to_plotly_json'):
+        # Figure plotly: ukuran dari spec dict-nya
+        return estimate_nbytes(obj.to_plotly_json())
+    if hasattr(obj, '__dict__'):
+        # Objek hasil (mis. SpendingDistribution): ukuran array atributnya
+        return sys.getsizeof(obj) + estimate_nbytes(vars(obj))
+    return sys.getsizeof(obj)
+
+
+def aggregate_fingerprint(frame):
+    """Fingerprint isi aggregate (kolom, index, nilai dan urutan baris)"""
+    row_hashes = pd.util.hash_pandas_object(frame, index=True).to_numpy()
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16)
+    digest.update(repr([(col, str(dtype)) for col, dtype in frame.dtypes.items()]).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU cache hasil komputasi per kombinasi filter, dibatasi total ukuran bytes.
+
+    Dipakai bersama oleh semua session. Hasil yang disimpan tidak boleh
+    dimodifikasi oleh pemanggil.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """Ambil hasil dari cache, hitung dan simpan kalau belum ada.
+
+        Key yang sedang dihitung thread lain (misalnya warming di background)
+        ditunggu sampai selesai, tidak dihitung dua kali.
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            result = compute()
+            nbytes = estimate_nbytes(result)
+            if nbytes > self.max_bytes:
+                return result  # terlalu besar untuk disimpan
+
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (result, nbytes)
+                    self.current_bytes += nbytes
+                while self.current_bytes > self.max_bytes:
+                    _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted_bytes
+                    self.evictions += 1
+            return result
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def clear(self):
+        """Kosongkan cache"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Statistik hit rate dan ukuran cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total > 0 else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+# Cache hasil process-wide, dipakai bersama semua session
+result_cache = ResultCache()
+
+# Pool terbatas untuk aggregate tab yang saling independen; groupby pandas banyak melepas GIL
+AGGREGATE_WORKERS = min(8, os.cpu_count() or 1)
+aggregate_executor = ThreadPoolExecutor(max_workers=AGGREGATE_WORKERS, thread_name_prefix='dashboard-aggregate')
+
+
+# Segmentasi customer berdasarkan total spending dan jumlah order
+SPENDING_SEGMENT_LABELS = ['Low (< R$ 100)', 'Medium (R$ 100-500)', 'High (R$ 500-2000)', 'VIP (> R$ 2000)']
+SPENDING_SEGMENT_BOUNDS = [100, 500, 2000]
+REPEAT_SEGMENT_LABELS = [
+    'One-time Buyer',
+    'Occasional Buyer (2-3 orders)',
+    'Regular Buyer (4-10 orders)',
+    'Frequent Buyer (>10 orders)'
+]
+
+
+def spending_segments(spending):
+    """Segment spending per customer (vectorized)"""
+    values = np.select(
+        [spending < bound for bound in SPENDING_SEGMENT_BOUNDS],
+        SPENDING_SEGMENT_LABELS[:3],
+        default=SPENDING_SEGMENT_LABELS[3]
+    )
+    return pd.Categorical(values, categories=SPENDING_SEGMENT_LABELS, ordered=True)
+
+
+def repeat_segments(order_count):
+    """Segment repeat purchase per customer (vectorized)"""
+    values = np.select(
+        [order_count == 1, order_count <= 3, order_count <= 10],
+        REPEAT_SEGMENT_LABELS[:3],
+        default=REPEAT_SEGMENT_LABELS[3]
+    )
+    return pd.Categorical(values, categories=REPEAT_SEGMENT_LABELS, ordered=True)
+
+
+# Batas band percentile spending per customer (P99 ke atas = whale)
+SPENDING_PERCENTILES = [25, 50, 75, 90, 99]
+
+
+class SpendingDistribution:
+    """Distribusi spending per customer terurut: nilai unik naik + jumlah customer per nilai.
+
+    Dibangun sekali per filter; median, percentile, jumlah spending per rank
+    dan statistik per segment cukup binary search di array kumulatif, tanpa
+    sort ulang. Sketch quantile memakai struktur yang sama dengan nilai
+    representatif per bucket.
+    """
+
+    def __init__(self, values, counts):
+        self.values = np.asarray(values, dtype='float64')
+        counts = np.asarray(counts, dtype='int64')
+        self.cum_counts = np.concatenate([[0], np.cumsum(counts)])
+        self.cum_totals = np.concatenate([[0.0], np.cumsum(self.values * counts)])
+        self.n = int(self.cum_counts[-1])
+
+    @classmethod
+    def from_spending(cls, spending):
+        values, counts = np.unique(np.asarray(spending, dtype='float64'), return_counts=True)
+        return cls(values, counts)
+
+    def _bucket(self, ranks):
+        # Posisi nilai unik yang memuat rank (0-based) dalam urutan naik
+        positions = np.searchsorted(self.cum_counts, ranks, side='right') - 1
+        return np.minimum(positions, len(self.values) - 1)
+
+    def value_at(self, ranks):
+        """Spending customer ke-rank (0-based, urut naik)"""
+        return self.values[self._bucket(ranks)]
+
+    def rank_total(self, ranks):
+        """Total spending customer dengan rank < ranks"""
+        ranks = np.asarray(ranks)
+        if self.n == 0:
+            return np.zeros(ranks.shape)
+        positions = self._bucket(ranks)
+        return self.cum_totals[positions] + (ranks - self.cum_counts[positions]) * self.values[positions]
+
+    def rank_of(self, spending):
+        """Jumlah customer dengan spending < spending"""
+        return self.cum_counts[np.searchsorted(self.values, spending, side='left')]
+
+    def quantile(self, q):
+        """Quantile dengan interpolasi linear, sama seperti Series.quantile"""
+        q = np.asarray(q, dtype='float64')
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        position = q * (self.n - 1)
+        lower = np.floor(position)
+        low, high = self.value_at(lower), self.value_at(np.ceil(position))
+        return low + (high - low) * (position - lower)
+
+    def median(self, start=0, stop=None):
+        """Median spending customer dengan rank di [start, stop), sama seperti Series.median"""
+        stop = self.n if stop is None else stop
+        if stop <= start:
+            return float('nan')
+        middle = start + (stop - start) // 2
+        if (stop - start) % 2:
+            return float(self.value_at(middle))
+        return float((self.value_at(middle - 1) + self.value_at(middle)) / 2)
+
+
+def build_customer_facts(data):
+    """Tabel fakta per customer_unique_id dalam satu groupby.
+
+    Berisi semua measure per customer yang dipakai customer spending metrics,
+    spending segments dan repeat purchase analysis.
+    """
+    facts = data.groupby('customer_unique_id').agg(
+        total_spending=('price', 'sum'),
+        order_count=('order_id', 'nunique'),
+        nama_state=('nama_state', 'first')
+    )
+    facts['spending_segment'] = spending_segments(facts['total_spending'].to_numpy())
+    facts['repeat_segment'] = repeat_segments(facts['order_count'].to_numpy())
+    return facts.reset_index()
+
+
+# Minimal jumlah order unik supaya kategori ikut analisis korelasi dan insights
+CATEGORY_MIN_ORDERS = 10
+
+
+def category_order_counts(data):
+    """Jumlah order unik per kategori produk dari data terfilter"""
+    return data.groupby('product_category_name_english', observed=True)['order_id'].nunique()
+
+
+def build_category_facts(cells, order_counts):
+    """Tabel fakta per kategori produk: avg_review (score > 0), total revenue, order unik.
+
+    Review dan revenue di-rollup dari cube; jumlah order unik (tidak aditif)
+    berasal dari category_order_counts atau aggregate streaming.
+    """
+    category_col = 'product_category_name_english'
+    measures = rollup(cells, category_col)
+
+    facts = pd.DataFrame({
+        'avg_review': average_review(measures).round(3),
+        'review_count': measures['review_count'],
+        'total_revenue': measures['revenue'].round(0),
+        'order_count': order_counts.reindex(measures.index, fill_value=0)
+    })
+    facts.index.name = 'category'
+    return facts.reset_index()
+
+
+def correlation_categories(category_facts, min_orders=CATEGORY_MIN_ORDERS):
+    """Kategori dengan minimal order dan review valid, untuk korelasi dan insights"""
+    selected = category_facts[
+        (category_facts['order_count'] >= min_orders) & (category_facts['review_count'] > 0)
+    ]
+    return selected[['category', 'avg_review', 'total_revenue', 'order_count']].reset_index(drop=True)
+
+
+# Aggregate per view dashboard: fungsi murni tanpa Streamlit, dipakai app dan benchmark
+
+def distinct_count(data, column, by=None):
+    """Distinct count exact, total atau per satu dimensi"""
+    if by is None:
+        return data[column].nunique()
+    return data.groupby(by, observed=True)[column].nunique()
+
+
+def spending_distribution(customer_facts):
+    """Distribusi spending terurut dari tabel fakta customer"""
+    return SpendingDistribution.from_spending(customer_facts['total_spending'])
+
+
+def customer_spending_summary(customer_facts, distribution=None):
+    """Rata-rata, median dan total spending per customer"""
+    customer_spending = customer_facts['total_spending']
+    distribution = distribution or spending_distribution(customer_facts)
+    return {
+        'avg_spending': customer_spending.mean(),
+        'median_spending': distribution.median(),
+        'total_customers': len(customer_spending),
+        'total_revenue': customer_spending.sum()
+    }
+
+
+def state_review_revenue(cells, score_type='review', state_col='nama_state'):
+    """Rata-rata review dan total revenue per state untuk peta review/revenue"""
+    state_measures = rollup(cells, state_col)
+
+    if score_type == 'review':
+        # State tanpa review score > 0 tidak ditampilkan
+        state_measures = state_measures[state_measures['review_count'] > 0]
+
+    state_data = pd.DataFrame({
+        'avg_review': average_review(state_measures),
+        'total_revenue': state_measures['revenue']
+    }).round(3)
+    return state_data.reset_index()
+
+
+def state_spending(cells, customers_by_state, state_col='nama_state'):
+    """Revenue, customer unik dan spending per customer per state"""
+    state_revenue = rollup(cells, state_col)['revenue']
+
+    state_data = pd.DataFrame({
+        'total_revenue': state_revenue,
+        'unique_customer_unique_ids': customers_by_state.reindex(state_revenue.index)
+    }).round(2)
+
+    state_data['spending_per_customer_unique_id'] = (state_data['total_revenue'] / state_data['unique_customer_unique_ids']).round(2)
+    return state_data.reset_index()
+
+
+def time_period_revenue(cells, orders_by_period, customers_by_period):
+    """Revenue, transaksi, order dan customer unik per periode waktu (urut waktu)"""
+    period_measures = rollup(cells, 'time_period')
+
+    time_period_data = pd.DataFrame({
+        'total_revenue': period_measures['revenue'],
+        'transaction_count': period_measures['row_count'],
+        'unique_orders': orders_by_period.reindex(period_measures.index),
+        'unique_customer_unique_ids': customers_by_period.reindex(period_measures.index)
+    }).round(2)
+    time_period_data.index.name = 'time_period'
+    time_period_data = time_period_data.reset_index()
+
+    time_period_data['avg_revenue_per_order'] = (time_period_data['total_revenue'] / time_period_data['unique_orders']).round(2)
+
+    # Urutkan berdasarkan urutan waktu yang logis
+    time_order = ['Dini Hari (00:00-06:00)', 'Pagi (06:00-12:00)', 'Siang (12:00-18:00)', 'Malam (18:00-24:00)']
+    time_period_data['time_period'] = pd.Categorical(time_period_data['time_period'], categories=time_order, ordered=True)
+    return time_period_data.sort_values('time_period')
+
+
+def spending_segment_stats(customer_facts, distribution=None):
+    """Jumlah customer, spending dan persentase per segment spending.
+
+    Segment adalah rentang spending, jadi setiap segment = rentang rank di
+    distribusi terurut: count, sum dan median tanpa groupby atau sort.
+    """
+    distribution = distribution or spending_distribution(customer_facts)
+    ranks = np.concatenate([[0], distribution.rank_of(SPENDING_SEGMENT_BOUNDS), [distribution.n]])
+    totals = distribution.rank_total(ranks)
+
+    segment_stats = pd.DataFrame({
+        'segment': SPENDING_SEGMENT_LABELS,
+        'customer_unique_id_count': np.diff(ranks),
+        'total_spending': np.diff(totals),
+        'median_spending': [distribution.median(start, stop) for start, stop in zip(ranks[:-1], ranks[1:])]
+    })
+    segment_stats = segment_stats[segment_stats['customer_unique_id_count'] > 0].reset_index(drop=True)
+    segment_stats.insert(3, 'avg_spending', segment_stats['total_spending'] / segment_stats['customer_unique_id_count'])
+    segment_stats = segment_stats.round(2)
+
+    segment_stats['percentage'] = (segment_stats['customer_unique_id_count'] / distribution.n * 100).round(1)
+
+    segment_stats['segment'] = pd.Categorical(segment_stats['segment'], categories=SPENDING_SEGMENT_LABELS, ordered=True)
+    return segment_stats
+
+
+def spending_percentile_bands(distribution, percentiles=SPENDING_PERCENTILES):
+    """Band percentile spending per customer: batas nilai, jumlah customer dan porsi total spending"""
+    if distribution.n == 0:
+        return pd.DataFrame(columns=['band', 'lower', 'upper', 'customer_count', 'total_spending', 'spending_percentage'])
+
+    edges = np.array([0] + list(percentiles) + [100])
+    # Customer diurutkan dari spending terkecil; band = rentang rank
+    ranks = np.round(edges / 100 * distribution.n).astype('int64')
+    totals = distribution.rank_total(ranks)
+    bounds = distribution.quantile(edges / 100)
+
+    bands = pd.DataFrame({
+        'band': [f"P{lower}-P{upper}" for lower, upper in zip(edges[:-1], edges[1:])],
+        'lower': bounds[:-1],
+        'upper': bounds[1:],
+        'customer_count': np.diff(ranks),
+        'total_spending': np.diff(totals)
+    }).round(2)
+    bands['spending_percentage'] = (bands['total_spending'] / totals[-1] * 100).round(1)
+    return bands
+
+
+def repeat_purchase_stats(customer_facts):
+    """Statistik per segment repeat purchase, total customer dan rata-rata order per customer"""
+    total_customer_unique_ids = len(customer_facts)
+
+    repeat_stats = customer_facts.groupby('repeat_segment', observed=True).agg({
+        'customer_unique_id': 'count',
+        'order_count': ['mean', 'sum'],
+        'total_spending': ['sum', 'mean']
+    }).round(2)
+
+    repeat_stats.columns = [
+        'customer_unique_id_count',
+        'avg_orders_per_customer_unique_id',
+        'total_orders',
+        'total_spending',
+        'avg_spending_per_customer_unique_id'
+    ]
+    repeat_stats = repeat_stats.reset_index()
+
+    # Persentase customer dan spending, nilai lifetime per customer
+    repeat_stats['customer_unique_id_percentage'] = (repeat_stats['customer_unique_id_count'] / total_customer_unique_ids * 100).round(1)
+    repeat_stats['spending_percentage'] = (repeat_stats['total_spending'] / customer_facts['total_spending'].sum() * 100).round(1)
+    repeat_stats['avg_lifetime_value'] = (repeat_stats['total_spending'] / repeat_stats['customer_unique_id_count']).round(2)
+
+    # Urutkan berdasarkan order count (bukan alphabet)
+    repeat_stats['repeat_segment'] = pd.Categorical(
+        repeat_stats['repeat_segment'],
+        categories=REPEAT_SEGMENT_LABELS,
+        ordered=True
+    )
+    repeat_stats = repeat_stats.sort_values('repeat_segment')
+
+    avg_orders = customer_facts['order_count'].mean().round(2)
+    return repeat_stats, total_customer_unique_ids, avg_orders
+
+
+def state_ranking_scores(cells, score_type='review'):
+    """Score per state untuk ranking: rata-rata review (score > 0) atau total revenue"""
+    state_measures = rollup(cells, 'nama_state')
+
+    if score_type == 'review':
+        state_measures = state_measures[state_measures['review_count'] > 0]
+        scores = average_review(state_measures).round(3).reset_index()
+    else:
+        scores = state_measures['revenue'].round(0).reset_index()
+    scores.columns = ['state', 'score']
+    return scores
+
+
+TREND_METRICS = ['revenue', 'orders', 'avg_review']
+TREND_SPLITS = ('nama_state', 'product_category_name_english')
+TREND_WINDOWS = (1, 3, 6, 12)
+TREND_COLUMNS = ['month', 'series'] + TREND_METRICS + [f'{metric}_rolling' for metric in TREND_METRICS] + [
+    f'{metric}_growth' for metric in TREND_METRICS
+]
+
+
+def monthly_trend(cells, split=None, window=3, top_n=5):
+    """Trend bulanan revenue, order unik dan rata-rata review dari cell aggregate bulanan.
+
+    split None = total keseluruhan, atau satu dimensi (nama_state /
+    product_category_name_english) dengan top_n nilai berdasarkan revenue.
+    Bulan tanpa transaksi diisi 0 supaya rolling window dan growth MoM
+    dihitung per bulan kalender. Satu baris per (month, series).
+    """
+    cells = cells[cells['tahun'].notna() & cells['bulan'].notna()]
+    if cells.empty:
+        return pd.DataFrame(columns=TREND_COLUMNS)
+
+    # Order per kategori dihitung sekali per kategori, selain itu sekali per order
+    orders_col = 'category_order_count' if split == 'product_category_name_english' else 'order_count'
+    frame = pd.DataFrame({
+        'month': pd.to_datetime(pd.DataFrame({
+            'year': cells['tahun'].astype('int64'), 'month': cells['bulan'].astype('int64'), 'day': 1
+        })),
+        'series': 'Total' if split is None else cells[split].astype(str),
+        'revenue': cells['revenue'],
+        'review_sum': cells['review_sum'],
+        'review_count': cells['review_count'],
+        'orders': cells[orders_col]
+    })
+    if split is not None:
+        top = frame.groupby('series')['revenue'].sum().nlargest(top_n).index
+        frame = frame[frame['series'].isin(top)]
+        frame = frame.assign(series=pd.Categorical(frame['series'], categories=list(top)))
+
+    months = pd.date_range(frame['month'].min(), frame['month'].max(), freq='MS', name='month')
+    wide = frame.groupby(['month', 'series'], observed=True).sum().unstack('series', fill_value=0)
+    wide = wide.reindex(months, fill_value=0)
+
+    def rolling(values):
+        return values.rolling(window, min_periods=1)
+
+    review_count = wide['review_count'].where(wide['review_count'] > 0)
+    rolling_review_count = rolling(wide['review_count']).sum()
+    metrics = {
+        'revenue': wide['revenue'],
+        'orders': wide['orders'],
+        'avg_review': wide['review_sum'] / review_count,
+        'revenue_rolling': rolling(wide['revenue']).mean(),
+        'orders_rolling': rolling(wide['orders']).mean(),
+        # Rata-rata review rolling ditimbang jumlah review, bukan rata-rata dari rata-rata
+        'avg_review_rolling': rolling(wide['review_sum']).sum() / rolling_review_count.where(rolling_review_count > 0)
+    }
+    for metric in TREND_METRICS:
+        growth = metrics[metric].pct_change(fill_method=None) * 100
+        metrics[f'{metric}_growth'] = growth.replace([np.inf, -np.inf], np.nan)
+
+    trend = pd.concat({name: values.stack() for name, values in metrics.items()}, axis=1).reset_index()
+    trend = trend.sort_values(['series', 'month'], kind='stable').reset_index(drop=True)
+    return trend[TREND_COLUMNS].round({
+        'revenue': 2, 'revenue_rolling': 2, 'orders_rolling': 2, 'avg_review': 3, 'avg_review_rolling': 3,
+        'revenue_growth': 1, 'orders_growth': 1, 'avg_review_growth': 1
+    })
@@ -4,7 +4,25 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+import logging
 import os
+import string
+
+from aggregations import (
+    TREND_WINDOWS, PartitionIndex, TimeIndex, aggregate_executor, aggregate_fingerprint, average_review,
+    build_category_facts, build_monthly_cube, correlation_categories, customer_spending_summary, filter_cells,
+    monthly_trend, repeat_purchase_stats, result_cache, rollup, select_rows, spending_distribution,
+    spending_percentile_bands, spending_segment_stats, state_ranking_scores, state_review_revenue, state_spending,
+    time_bounds, time_period_revenue
+)
+from data_loader import MONTH_LABELS, dataset_cache
+from parallel import get_aggregator
+from service import get_client
+from shared_dataset import get_shared_cache
+from sketches import DistinctSketches, SpendingSketches
+from streaming import streaming_cache, watch_drop_directory
+
+logger = logging.getLogger(__name__)
 
 # Konfigurasi page
 st.set_page_config(
@@ -128,8 +146,18 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 class FinalCleanBrazilEcommerceDashboard:
-    def __init__(self, data_path="main_data.csv"):
+    def __init__(self, data_path="main_data.csv", lazy_tabs=False, ingest='memory', drop_dir=None,
+                 aggregation='serial', service_url=None, shared_dir=None):
         self.data_path = data_path
+        self.lazy_tabs = lazy_tabs
+        self.ingest = ingest
+        self.drop_dir = drop_dir
+        # Frontend tipis: aggregate diambil dari service, dataset tidak di-load di proses ini
+        self.service_url = service_url
+        # Mode shared: kolom di-map read-only dari satu file yang dipakai bersama semua worker
+        self.dataset_cache = get_shared_cache(shared_dir) if ingest == 'shared' else dataset_cache
+        # Backend groupby berat (cube, fakta customer, distinct count): serial atau process pool
+        self.aggregator = get_aggregator(aggregation)
         self.load_data()
         self.setup_brazil_coordinates()
         
@@ -165,55 +193,70 @@ class FinalCleanBrazilEcommerceDashboard:
             'Tocantins': {'lat': -9.9725, 'lon': -48.1882}
         }
         
+        # Tabel koordinat ter-index nama state, untuk join vectorized di peta
+        self.state_coords = pd.DataFrame.from_dict(self.brazil_states_coords, orient='index')
+        self.state_coords.index.name = 'nama_state'
+        
     def load_data(self):
         """Load dan preprocess data"""
         try:
             # Cek apakah file ada
-            if not os.path.exists(self.data_path):
+            if not self.service_url and not os.path.exists(self.data_path):
                 st.error(f"❌ File '{self.data_path}' tidak ditemukan. Pastikan file berada dalam folder yang sama dengan script ini.")
                 st.stop()
             
-            self.df = pd.read_csv(self.data_path)
-            
-            # Convert timestamp
-            self.df['order_purchase_timestamp'] = pd.to_datetime(
-                self.df['order_purchase_timestamp'], errors='coerce'
-            )
-            
-            # Extract time features
-            self.df['tahun'] = self.df['order_purchase_timestamp'].dt.year
-            self.df['bulan'] = self.df['order_purchase_timestamp'].dt.month
-            self.df['jam'] = self.df['order_purchase_timestamp'].dt.hour
-            
-            # Kategorikan waktu berdasarkan jam
-            def categorize_time_period(hour):
-                if 0 <= hour < 6:
-                    return 'Dini Hari (00:00-06:00)'
-                elif 6 <= hour < 12:
-                    return 'Pagi (06:00-12:00)'
-                elif 12 <= hour < 18:
-                    return 'Siang (12:00-18:00)'
-                else:
-                    return 'Malam (18:00-24:00)'
-            
-            self.df['time_period'] = self.df['jam'].apply(categorize_time_period)
-            
-            # State mapping
-            state_names = {
-                'AC': 'Acre', 'AL': 'Alagoas', 'AP': 'Amapá', 'AM': 'Amazonas',
-                'BA': 'Bahia', 'CE': 'Ceará', 'DF': 'Distrito Federal', 
-                'ES': 'Espírito Santo', 'GO': 'Goiás', 'MA': 'Maranhão',
-                'MT': 'Mato Grosso', 'MS': 'Mato Grosso do Sul', 'MG': 'Minas Gerais',
-                'PA': 'Pará', 'PB': 'Paraíba', 'PR': 'Paraná', 'PE': 'Pernambuco',
-                'PI': 'Piauí', 'RJ': 'Rio de Janeiro', 'RN': 'Rio Grande do Norte',
-                'RS': 'Rio Grande do Sul', 'RO': 'Rondônia', 'RR': 'Roraima',
-                'SC': 'Santa Catarina', 'SP': 'São Paulo', 'SE': 'Sergipe',
-                'TO': 'Tocantins'
-            }
+            if self.service_url:
+                # Cube diambil sekali per versi dataset di service, query berbasis baris dikirim ke service
+                self.aggregates = get_client(self.service_url).snapshot()
+                self.dataset_key = self.aggregates.key
+                self.df = None
+                self.cube = self.aggregates.cube
+                n_records = self.aggregates.n_rows
+                cache = None
+            elif self.ingest == 'streaming':
+                # CSV dibaca per chunk langsung ke aggregate, frame mentah tidak disimpan
+                if self.drop_dir:
+                    watch_drop_directory(self.data_path, self.drop_dir)
+                aggregates, file_key = streaming_cache.get(self.data_path)
+                
+                # Satu snapshot per run; versi naik setiap ada append dari folder drop
+                self.aggregates = aggregates.snapshot
+                self.dataset_key = file_key + (self.aggregates.version,)
+                self.df = None
+                self.cube = self.aggregates.cube
+                n_records = self.aggregates.n_rows
+                cache = streaming_cache
+            else:
+                # Ambil dari cache process-wide, parse ulang hanya kalau file berubah
+                self.df, self.dataset_key = self.dataset_cache.get(self.data_path)
+                
+                # Cube pre-aggregate dibangun sekali per versi dataset (index partisi mode shared ikut di-map)
+                self.cube = self.dataset_cache.derived(self.dataset_key, 'cube', lambda: self.aggregator.build_cube(self.df))
+                self.partitions = self.dataset_cache.derived(self.dataset_key, 'partitions', lambda: PartitionIndex(self.df))
+                # Frame terurut per timestamp: filter bulan/rentang tanggal jadi slice lewat binary search
+                self.time_index = self.dataset_cache.derived(
+                    self.dataset_key, 'time_index', lambda: TimeIndex(self.df['order_purchase_timestamp'])
+                )
+                n_records = len(self.df)
+                cache = self.dataset_cache
             
-            self.df['nama_state'] = self.df['customer_state'].map(state_names)
+            st.success(f"✅ Data berhasil dimuat! Total {n_records:,} records")
+            if self.drop_dir and (self.service_url or self.ingest != 'streaming'):
+                st.warning(
+                    f"⚠️ Folder drop '{self.drop_dir}' tidak dipantau: DASHBOARD_DROP_DIR hanya berlaku "
+                    "di mode streaming (DASHBOARD_INGEST=streaming tanpa DASHBOARD_SERVICE_URL)"
+                )
             
-            st.success(f"✅ Data berhasil dimuat! Total {len(self.df):,} records")
+            result_stats = result_cache.stats()
+            dataset_caption = f"Service: {self.service_url}"
+            if cache is not None:
+                cache_stats = cache.stats()
+                dataset_caption = f"Cache dataset: {cache_stats['hits']:,} hit / {cache_stats['misses']:,} miss"
+            st.caption(
+                f"{dataset_caption} · "
+                f"Cache hasil: {result_stats['hit_rate']:.0%} hit rate "
+                f"({result_stats['entries']:,} entry, {result_stats['bytes'] / 1024 ** 2:.1f} MB)"
+            )
             
         except Exception as e:
             st.error(f"❌ Error loading data: {str(e)}")
@@ -225,10 +268,12 @@ class FinalCleanBrazilEcommerceDashboard:
         
         with st.expander("🎛️ **FILTER SETTINGS**", expanded=False):
             col1, col2 = st.columns(2)
+            # Mode streaming tidak punya frame mentah, opsi filter diambil dari cube
+            source = self.cube if self.df is None else self.df
             
             with col1:
                 # Filter Tahun dengan opsi All Time
-                tahun_options = ['All Time'] + sorted(self.df['tahun'].unique())
+                tahun_options = ['All Time'] + sorted(source['tahun'].unique())
                 selected_year = st.selectbox(
                     "**Pilih Periode Waktu:**",
                     options=tahun_options,
@@ -237,23 +282,151 @@ class FinalCleanBrazilEcommerceDashboard:
             
             with col2:
                 # Filter Periode Waktu
-                time_period_options = sorted(self.df['time_period'].dropna().unique())
+                time_period_options = sorted(source['time_period'].dropna().unique())
                 selected_time_period = st.multiselect(
                     "**Pilih Periode Hari:**",
                     options=time_period_options,
                     default=time_period_options
                 )
             
-            # Apply filters
-            filtered_data = self.df.copy()
+            # Drill-down bulan dan rentang tanggal (butuh frame terurut, tidak ada di mode streaming)
+            selected_time = None if self.df is None else self.create_time_filters(selected_year)
+            
+            # Mode distinct count dan percentile: exact (default) atau estimasi dari sketch
+            # (mode streaming selalu exact dari tabel aggregate, sketch butuh frame mentah;
+            # sketch per tahun x periode, jadi tidak berlaku untuk filter bulan/rentang tanggal)
+            self.approx_distinct = self.df is not None and selected_time is None and st.toggle(
+                "Approximate distinct count & percentile (sketch)",
+                value=False,
+                help="Jumlah order dan customer unik (HyperLogLog) dan percentile spending dihitung dari sketch yang sudah dihitung sebelumnya"
+            )
+            if self.approx_distinct:
+                self.sketches = self.dataset_cache.derived(self.dataset_key, 'distinct_sketches', lambda: DistinctSketches(self.df))
+                self.sketch_mask = self.sketches.select(selected_year, selected_time_period)
+                self.spending_sketches = self.dataset_cache.derived(
+                    self.dataset_key, 'spending_sketches', lambda: SpendingSketches(self.df)
+                )
+                # Sketch spending hanya ada untuk satu periode, semua periode, atau tanpa filter periode
+                self.spending_sketch = self.spending_sketches.select(selected_year, selected_time_period)
+                spending_caption = (
+                    f"error relatif ±{self.spending_sketches.relative_accuracy:.0%}"
+                    if self.spending_sketch is not None else "exact (sketch hanya untuk satu atau semua periode hari)"
+                )
+                st.caption(
+                    f"Estimasi distinct count: standard error ±{self.sketches.relative_error:.1%} · "
+                    f"percentile spending: {spending_caption}"
+                )
             
-            if selected_year != 'All Time':
-                filtered_data = filtered_data[filtered_data['tahun'] == selected_year]
+            self.selected_filter = (selected_year, selected_time_period)
+            self.selected_time = selected_time
+            self.filter_key = (self.dataset_key, selected_year, frozenset(selected_time_period), selected_time)
+            if self.df is None:
+                filtered_data = None
+            else:
+                # Apply filters lewat index partisi: satu take, tanpa copy kalau semua baris terpilih
+                # atau filternya hanya rentang waktu (frame dipakai bersama semua session, jangan dimodifikasi)
+                rows = None if selected_time is None else self.time_index.slice(*selected_time)
+                self.selected_positions = self.partitions.select(selected_year, selected_time_period, rows)
+                filtered_data = select_rows(self.df, self.selected_positions)
             
-            if selected_time_period:
-                filtered_data = filtered_data[filtered_data['time_period'].isin(selected_time_period)]
+            # Cell cube dengan filter yang sama, untuk measure aditif
+            if selected_time is None:
+                filtered_cells = filter_cells(self.cube, selected_year, selected_time_period)
+            else:
+                # Cube tidak punya granularitas tanggal: cell dibangun dari baris terpilih
+                filtered_cells = self.memoize('cells', lambda: self.aggregator.build_cube(filtered_data))
             
-            return filtered_data, selected_year
+            return filtered_data, filtered_cells, selected_year
+    
+    def create_time_filters(self, selected_year):
+        """Filter bulan (kalau tahun dipilih) dan rentang tanggal; batas (start, end) atau None"""
+        date_range = self.time_index.date_range()
+        if date_range is None:
+            return None
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            # 0 = semua bulan (opsi None di selectbox terbaca sebagai belum memilih)
+            month_options = [0]
+            if selected_year != 'All Time' and pd.notna(selected_year):
+                month_options += self.time_index.months_in_year(selected_year)
+            selected_month = st.selectbox(
+                "**Pilih Bulan:**",
+                options=month_options,
+                format_func=lambda month: 'Semua Bulan' if month == 0 else MONTH_LABELS[month - 1],
+                disabled=len(month_options) == 1
+            )
+        
+        with col2:
+            # Rentang tanggal dibatasi ke tahun/bulan terpilih, jadi tidak bisa keluar dari filter itu
+            if selected_year != 'All Time' and pd.notna(selected_year):
+                year_start = pd.Timestamp(year=int(selected_year), month=1, day=1)
+                period = time_bounds(selected_year, selected_month or None) or (year_start, year_start + pd.DateOffset(years=1))
+                date_range = self.time_index.date_range(*period) or date_range
+            selected_dates = st.date_input(
+                "**Rentang Tanggal:**",
+                value=date_range,
+                min_value=date_range[0],
+                max_value=date_range[1]
+            )
+        
+        # Rentang penuh (atau baru satu tanggal yang dipilih) = tidak dibatasi
+        if len(selected_dates) != 2 or tuple(selected_dates) == date_range:
+            selected_dates = None
+        return time_bounds(selected_year, selected_month or None, selected_dates)
+    
+    def memoize(self, method, compute, *args):
+        """Hasil komputasi per (versi dataset, filter, method), disimpan di result_cache"""
+        key = (self.filter_key, method) + args
+        return result_cache.get_or_compute(key, compute)
+    
+    def customer_facts(self, data):
+        """Tabel fakta per customer untuk filter aktif, dipakai bersama semua view customer"""
+        if data is None:
+            return self.memoize('customer_facts', lambda: self.aggregates.customer_facts(*self.selected_filter))
+        return self.memoize('customer_facts', lambda: self.aggregator.build_customer_facts(data))
+    
+    def customer_stats(self, data, method, summarize):
+        """Statistik turunan tabel fakta customer; mode service menghitungnya di service"""
+        def compute():
+            if self.service_url:
+                return self.aggregates.query(method, *self.selected_filter)
+            return summarize(self.customer_facts(data))
+        
+        return self.memoize(method, compute)
+    
+    def category_facts(self, data, cells):
+        """Tabel fakta per kategori untuk filter aktif, dipakai bersama semua subtab produk"""
+        def compute():
+            if data is None:
+                return build_category_facts(cells, self.aggregates.category_order_counts(*self.selected_filter))
+            return build_category_facts(cells, self.aggregator.category_order_counts(data))
+        
+        return self.memoize('category_facts', compute)
+    
+    def count_distinct(self, data, column, by=None):
+        """Distinct count exact dari data atau aggregate streaming, atau estimasi sketch kalau mode approximate aktif"""
+        approx = getattr(self, 'approx_distinct', False)
+        
+        def compute():
+            if approx:
+                return self.sketches.estimate(column, self.sketch_mask, by)
+            if data is None:
+                return self.aggregates.distinct_count(column, *self.selected_filter, by=by)
+            return self.aggregator.distinct_count(data, column, by)
+        
+        return self.memoize('count_distinct', compute, column, by, approx)
+    
+    def cached_figure(self, chart_type, aggregate, build):
+        """Figure per (fingerprint aggregate, jenis chart) dari result_cache.
+        
+        Figure hanya dibangun ulang kalau isi aggregate berubah. Figure yang
+        dikembalikan dipakai bersama, jangan dimodifikasi. Yang di-memoize
+        hanya pembuatan figure: st.plotly_chart tetap men-serialize spec JSON
+        setiap rerun (API-nya tidak menerima spec yang sudah di-encode).
+        """
+        key = ('figure', chart_type, aggregate_fingerprint(aggregate))
+        return result_cache.get_or_compute(key, build)
     
     def create_mini_metric(self, value, label, icon):
         """Membuat metric card minimalis"""
@@ -264,161 +437,203 @@ class FinalCleanBrazilEcommerceDashboard:
         </div>
         """, unsafe_allow_html=True)
     
-    def display_minimal_review_metrics(self, data):
+    def render_cards(self, template, rows):
+        """Render semua card satu block dalam satu st.markdown.
+        
+        Template memakai placeholder {kolom:format}; setiap kolom diformat
+        sekali untuk semua baris lalu digabung menjadi satu HTML.
+        """
+        if len(rows) == 0:
+            return
+        
+        html = pd.Series('', index=rows.index, dtype=object)
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            html = html + literal
+            if field is not None:
+                html = html + rows[field].astype(object).map(f"{{:{spec}}}".format)
+        st.markdown(''.join(html), unsafe_allow_html=True)
+    
+    def render_ranking_items(self, rows, name_col, score_format, ranks, bottom=False):
+        """Render item ranking top/bottom dalam satu st.markdown"""
+        item_class, score_class = ('ranking-item-bottom', 'ranking-score-bad') if bottom else ('ranking-item-top', 'ranking-score')
+        template = (f"<div class='{item_class}'>"
+                    "<span class='ranking-number'>#{rank}</span>"
+                    f"<span class='ranking-name'>{{{name_col}}}</span>"
+                    f"<span class='{score_class}'>{score_format}</span>"
+                    "</div>")
+        self.render_cards(template, rows.assign(rank=ranks))
+    
+    def display_minimal_review_metrics(self, cells):
         """Menampilkan metric cards minimalis untuk review"""
+        totals = rollup(cells)
+        
         with st.expander("📊 **REVIEW METRICS**", expanded=False):
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                # PERBAIKAN: Filter out review_score = 0 sebelum menghitung rata-rata
-                valid_reviews = data[data['review_score'] > 0]
-                avg_review = valid_reviews['review_score'].mean()
+                # PERBAIKAN: review_score = 0 tidak ikut rata-rata (review_count hanya score > 0)
+                avg_review = average_review(totals)
                 self.create_mini_metric(f"{avg_review:.2f}/5.0", "Rata-rata Review", "⭐")
                 
             with col2:
-                positive_reviews = (data['review_score'] >= 4).sum()
-                total_reviews = len(data)
+                positive_reviews = totals['positive_count']
+                total_reviews = totals['row_count']
                 positive_pct = (positive_reviews / total_reviews * 100) if total_reviews > 0 else 0
                 self.create_mini_metric(f"{positive_pct:.1f}%", "Review Positif (≥4)", "😊")
                 
             with col3:
-                negative_reviews = (data['review_score'] <= 2).sum()
+                negative_reviews = totals['negative_count']
                 negative_pct = (negative_reviews / total_reviews * 100) if total_reviews > 0 else 0
                 self.create_mini_metric(f"{negative_pct:.1f}%", "Review Negatif (≤2)", "😞")
                 
             with col4:
                 # PERBAIKAN: Hitung jumlah review dengan score 0
-                count_zero_review = (data['review_score'] == 0).sum()
+                count_zero_review = totals['zero_count']
                 total_reviews_count = total_reviews
                 self.create_mini_metric(f"{total_reviews_count:,}", f"Total Review ({count_zero_review} score 0)", "📝")
     
-    def display_minimal_revenue_metrics(self, data):
+    def display_minimal_revenue_metrics(self, data, cells):
         """Menampilkan metric cards minimalis untuk revenue"""
         with st.expander("💰 **REVENUE METRICS**", expanded=False):
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                total_revenue = data['price'].sum()
+                total_revenue = rollup(cells)['revenue']
                 self.create_mini_metric(f"R$ {total_revenue:,.0f}", "Total Revenue", "💰")
                 
             with col2:
-                total_orders = data['order_id'].nunique()
+                total_orders = self.count_distinct(data, 'order_id')
                 self.create_mini_metric(f"{total_orders:,}", "Total Orders", "📦")
                 
             with col3:
-                total_customers = data['customer_unique_id'].nunique()
+                total_customers = self.count_distinct(data, 'customer_unique_id')
                 self.create_mini_metric(f"{total_customers:,}", "Unique Customers", "👥")
                 
             with col4:
                 avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
                 self.create_mini_metric(f"R$ {avg_order_value:.2f}", "Avg Order Value", "📊")
     
+    def spending_distribution(self, data):
+        """Spending per customer terurut untuk filter aktif, dipakai median, segment dan percentile"""
+        return self.memoize('spending_distribution', lambda: spending_distribution(self.customer_facts(data)))
+    
+    def customer_spending_data(self, data):
+        """Spending per customer_unique_id dari tabel fakta customer"""
+        return self.customer_stats(
+            data, 'customer_spending', lambda facts: customer_spending_summary(facts, self.spending_distribution(data))
+        )
+    
+    def spending_percentile_data(self, data):
+        """Band percentile spending per customer: exact dari distribusi terurut, atau estimasi sketch"""
+        approx = getattr(self, 'approx_distinct', False) and self.spending_sketch is not None
+        
+        def compute():
+            if self.service_url:
+                return self.aggregates.query('spending_percentiles', *self.selected_filter)
+            if approx:
+                return spending_percentile_bands(self.spending_sketches.distribution(self.spending_sketch))
+            return spending_percentile_bands(self.spending_distribution(data))
+        
+        return self.memoize('spending_percentiles', compute, approx)
+    
+    def create_percentile_band_chart(self, bands):
+        """Bar chart porsi total spending per band percentile"""
+        def build():
+            fig = go.Figure(go.Bar(
+                x=bands['band'],
+                y=bands['spending_percentage'],
+                marker_color='#1f77b4',
+                customdata=bands[['lower', 'upper', 'customer_count']],
+                hovertemplate=(
+                    "<b>%{x}</b><br>Spending: R$ %{customdata[0]:,.2f} - R$ %{customdata[1]:,.2f}<br>"
+                    "Customers: %{customdata[2]:,}<br>Porsi spending: %{y:.1f}%<extra></extra>"
+                )
+            ))
+            fig.update_layout(
+                height=300,
+                margin=dict(t=30, b=30, l=20, r=20),
+                yaxis_title="Porsi Total Spending (%)"
+            )
+            return fig
+        
+        return self.cached_figure('spending_percentile_bands', bands, build)
+    
     def display_customer_spending_metrics(self, data):
         """Menampilkan metric cards untuk customer spending"""
-        with st.expander("👥 **CUSTOMER SPENDING METRICS**", expanded=False):
-            # Hitung spending per customer_unique_id per state
-            customer_spending = data.groupby('customer_unique_id').agg({
-                'price': 'sum',
-                'nama_state': 'first'
-            }).reset_index()
+        spending = self.customer_spending_data(data)
             
+        with st.expander("👥 **CUSTOMER SPENDING METRICS**", expanded=False):
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                avg_spending = customer_spending['price'].mean()
+                avg_spending = spending['avg_spending']
                 self.create_mini_metric(f"R$ {avg_spending:.2f}", "Rata-rata Spending/Customer", "💰")
                 
             with col2:
-                median_spending = customer_spending['price'].median()
+                median_spending = spending['median_spending']
                 self.create_mini_metric(f"R$ {median_spending:.2f}", "Median Spending/Customer", "📊")
                 
             with col3:
-                total_customers = customer_spending['customer_unique_id'].nunique()
+                total_customers = spending['total_customers']
                 self.create_mini_metric(f"{total_customers:,}", "Total Unique Customers", "👥")
                 
             with col4:
-                total_revenue = customer_spending['price'].sum()
+                total_revenue = spending['total_revenue']
                 self.create_mini_metric(f"R$ {total_revenue:,.0f}", "Total Customer Spending", "💎")
-    
-    def create_simple_map(self, data, score_type='review'):
-        """Membuat peta Brazil sederhana yang pasti work"""
-        # Aggregate data per state
-        if 'customer_state_full' in data.columns:
-            state_col = 'customer_state_full'
-        else:
-            state_col = 'nama_state'
-        
-        if score_type == 'review':
-            # PERBAIKAN: Filter out review_score = 0 sebelum menghitung rata-rata
-            valid_reviews = data[data['review_score'] > 0]
-            state_data = valid_reviews.groupby(state_col).agg({
-                'review_score': 'mean',
-                'price': 'sum'
-            }).round(3)
-        else:
-            state_data = data.groupby(state_col).agg({
-                'review_score': 'mean',
-                'price': 'sum'
-            }).round(3)
-        
-        state_data.columns = ['avg_review', 'total_revenue']
-        state_data = state_data.reset_index()
-        
-        # Tambahkan koordinat
-        state_data['lat'] = state_data[state_col].map(lambda x: self.brazil_states_coords.get(x, {}).get('lat', 0))
-        state_data['lon'] = state_data[state_col].map(lambda x: self.brazil_states_coords.get(x, {}).get('lon', 0))
-        state_data = state_data[state_data['lat'] != 0]
-        
-        if score_type == 'review':
-            z_col = 'avg_review'
-            title = 'Rata-rata Review Score'
-            colorscale = 'RdYlGn'
-            color_min = 3.0
-            color_max = 5.0
-            colorbar_title = "Review Score"
-            
-            # Format hover text dengan aman
-            hover_texts = []
-            for idx, row in state_data.iterrows():
-                text = f"{row[state_col]}<br>Review: {row[z_col]:.2f}"
-                hover_texts.append(text)
-                
-        else:
-            z_col = 'total_revenue'
-            title = 'Total Revenue (R$)'
-            colorscale = 'Blues'
-            color_min = state_data[z_col].min()
-            color_max = state_data[z_col].max()
-            colorbar_title = "Revenue (R$)"
             
-            # Format hover text dengan aman
-            hover_texts = []
-            for idx, row in state_data.iterrows():
-                text = f"{row[state_col]}<br>Revenue: R$ {row[z_col]:,.0f}"
-                hover_texts.append(text)
+            # Band percentile: batas P25-P99 dan porsi spending per band (P99 ke atas = whale)
+            bands = self.spending_percentile_data(data)
+            if len(bands):
+                st.markdown("**📶 PERCENTILE SPENDING/CUSTOMER**")
+                cut_points = bands.iloc[:-1]
+                for col, (_, band) in zip(st.columns(len(cut_points)), cut_points.iterrows()):
+                    with col:
+                        self.create_mini_metric(f"R$ {band['upper']:,.2f}", band['band'].split('-')[1], "📈")
+                st.plotly_chart(self.create_percentile_band_chart(bands), use_container_width=True)
+    
+    def attach_coordinates(self, state_data, state_col='nama_state'):
+        """Join koordinat state dalam satu merge; state tanpa koordinat tidak ditampilkan"""
+        return state_data.merge(self.state_coords, left_on=state_col, right_index=True, how='inner')
+    
+    def format_hover_text(self, state_data, parts, state_col='nama_state'):
+        """Hover text per state dari (label, kolom, format spec) secara vectorized"""
+        text = state_data[state_col].astype(str)
+        for label, col, spec in parts:
+            text = text + f"<br>{label}" + state_data[col].map(f"{{:{spec}}}".format).astype(str)
+        return text.to_numpy()
+    
+    def create_state_map(self, state_data, z_col, hover_text, title, colorscale, color_range,
+                         colorbar, marker_size=20, geo=None):
+        """Peta scattergeo per state, dipakai semua varian peta di dashboard"""
+        geo_layout = dict(
+            scope = 'south america',
+            showland = True,
+            landcolor = 'rgb(243, 243, 243)',
+            countrycolor = 'rgb(204, 204, 204)',
+            showcountries = True,
+            center=dict(lat=-14, lon=-55),
+            projection_scale=3
+        )
+        geo_layout.update(geo or {})
         
-        # Buat peta dengan scattergeo
         fig = go.Figure()
-        
+            
         fig.add_trace(go.Scattergeo(
             lon = state_data['lon'],
             lat = state_data['lat'],
-            text = hover_texts,
+            text = hover_text,
             hoverinfo = 'text',
             marker = dict(
-                size = 20,
+                size = marker_size,
                 color = state_data[z_col],
                 colorscale = colorscale,
-                cmin = color_min,
-                cmax = color_max,
-                colorbar = dict(
-                    title = colorbar_title,
-                    thickness = 15
-                ),
+                cmin = color_range[0],
+                cmax = color_range[1],
+                colorbar = dict(thickness=15, **colorbar),
                 line = dict(width=1, color='white'),
             )
         ))
-        
+            
         fig.update_layout(
             title = dict(
                 text = f"<b>{title}</b>",
@@ -426,287 +641,265 @@ class FinalCleanBrazilEcommerceDashboard:
                 xanchor = 'center',
                 font = dict(size=14)
             ),
-            geo = dict(
-                scope = 'south america',
-                showland = True,
-                landcolor = 'rgb(243, 243, 243)',
-                countrycolor = 'rgb(204, 204, 204)',
-                showcountries = True,
-                center=dict(lat=-14, lon=-55),
-                projection_scale=3
-            ),
+            geo = geo_layout,
             height = 400,
             margin = dict(l=0, r=0, t=40, b=0)
         )
+            
+        return fig
+    
+    def state_map_data(self, cells, score_type='review', state_col='nama_state'):
+        """Rollup cube per state untuk peta review/revenue, lalu tambahkan koordinat"""
+        def compute():
+            return self.attach_coordinates(state_review_revenue(cells, score_type, state_col), state_col)
         
-        return fig, state_data
+        return self.memoize('create_simple_map', compute, score_type)
     
-    def create_customer_spending_map(self, data):
-        """Membuat peta spending per customer_unique_id dengan ukuran lebih kecil"""
-        # Aggregate data per state - revenue dan unique customer_unique_ids
-        if 'customer_state_full' in data.columns:
-            state_col = 'customer_state_full'
+    def create_simple_map(self, cells, score_type='review'):
+        """Membuat peta Brazil sederhana yang pasti work"""
+        state_col = 'nama_state'
+        state_data = self.state_map_data(cells, score_type, state_col)
+            
+        if score_type == 'review':
+            z_col = 'avg_review'
+            title = 'Rata-rata Review Score'
+            colorscale = 'RdYlGn'
+            color_range = (3.0, 5.0)
+            colorbar_title = "Review Score"
+            hover_parts = [('Review: ', z_col, '.2f')]
         else:
-            state_col = 'nama_state'
-        
-        state_data = data.groupby(state_col).agg({
-            'price': 'sum',
-            'customer_unique_id': 'nunique'
-        }).round(2)
-        
-        state_data.columns = ['total_revenue', 'unique_customer_unique_ids']
-        
-        # Hitung spending per customer_unique_id
-        state_data['spending_per_customer_unique_id'] = (state_data['total_revenue'] / state_data['unique_customer_unique_ids']).round(2)
-        state_data = state_data.reset_index()
-        
-        # Tambahkan koordinat
-        state_data['lat'] = state_data[state_col].map(lambda x: self.brazil_states_coords.get(x, {}).get('lat', 0))
-        state_data['lon'] = state_data[state_col].map(lambda x: self.brazil_states_coords.get(x, {}).get('lon', 0))
-        state_data = state_data[state_data['lat'] != 0]
-        
-        # Format hover text
-        hover_texts = []
-        for idx, row in state_data.iterrows():
-            text = f"{row[state_col]}<br>Spending/Customer: R$ {row['spending_per_customer_unique_id']:.2f}<br>Total Customers: {row['unique_customer_unique_ids']:,}<br>Total Revenue: R$ {row['total_revenue']:,.0f}"
-            hover_texts.append(text)
-        
-        # Buat peta dengan ukuran lebih kecil (10cm x 10cm)
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scattergeo(
-            lon = state_data['lon'],
-            lat = state_data['lat'],
-            text = hover_texts,
-            hoverinfo = 'text',
-            marker = dict(
-                size = 15,  # Ukuran marker lebih kecil
-                color = state_data['spending_per_customer_unique_id'],
-                colorscale = 'Viridis',
-                cmin = state_data['spending_per_customer_unique_id'].min(),
-                cmax = state_data['spending_per_customer_unique_id'].max(),
-                colorbar = dict(
-                    title = "Spending/Customer (R$)",
-                    thickness = 15,
-                    len = 0.6
-                ),
-                line = dict(width=1, color='white'),
-            )
+            z_col = 'total_revenue'
+            title = 'Total Revenue (R$)'
+            colorscale = 'Blues'
+            color_range = (state_data[z_col].min(), state_data[z_col].max())
+            colorbar_title = "Revenue (R$)"
+            hover_parts = [('Revenue: R$ ', z_col, ',.0f')]
+            
+        fig = self.cached_figure(f'state_map_{score_type}', state_data, lambda: self.create_state_map(
+            state_data, z_col,
+            hover_text=self.format_hover_text(state_data, hover_parts, state_col),
+            title=title,
+            colorscale=colorscale,
+            color_range=color_range,
+            colorbar=dict(title=colorbar_title)
         ))
+            
+        return fig, state_data
+    
+    def customer_spending_map_data(self, data, cells, state_col='nama_state'):
+        """Spending per customer per state: revenue dari cube, unique customer dari distinct count"""
+        def compute():
+            state_customers = self.count_distinct(data, 'customer_unique_id', by=state_col)
+            return self.attach_coordinates(state_spending(cells, state_customers, state_col), state_col)
         
-        fig.update_layout(
-            title = dict(
-                text = "<b>Average Spending per Customer by State</b>",
-                x = 0.5,
-                xanchor = 'center',
-                font = dict(size=14)
-            ),
-            geo = dict(
-                scope = 'south america',
-                showland = True,
-                landcolor = 'rgb(243, 243, 243)',
-                countrycolor = 'rgb(204, 204, 204)',
-                showcountries = True,
-                showocean = True,
-                oceancolor = 'rgb(204, 229, 255)',
-                center=dict(lat=-14, lon=-55),
-                projection_scale=2.5,  # Zoom level lebih kecil
-                lonaxis_range=[-75, -30],  # Batas longitude
-                lataxis_range=[-35, 5],    # Batas latitude
-            ),
-            height = 400,  # Tinggi peta lebih kecil
-            margin = dict(l=0, r=0, t=40, b=0)
-        )
-        
+        return self.memoize('create_customer_spending_map', compute, getattr(self, 'approx_distinct', False))
+    
+    def create_customer_spending_map(self, data, cells):
+        """Membuat peta spending per customer_unique_id dengan ukuran lebih kecil"""
+        state_col = 'nama_state'
+        state_data = self.customer_spending_map_data(data, cells, state_col)
+            
+        def build():
+            # Format hover text
+            hover_text = self.format_hover_text(state_data, [
+                ('Spending/Customer: R$ ', 'spending_per_customer_unique_id', '.2f'),
+                ('Total Customers: ', 'unique_customer_unique_ids', ','),
+                ('Total Revenue: R$ ', 'total_revenue', ',.0f')
+            ], state_col)
+                
+            # Peta dengan ukuran lebih kecil (10cm x 10cm)
+            z_col = 'spending_per_customer_unique_id'
+            return self.create_state_map(
+                state_data, z_col,
+                hover_text=hover_text,
+                title="Average Spending per Customer by State",
+                colorscale='Viridis',
+                color_range=(state_data[z_col].min(), state_data[z_col].max()),
+                colorbar=dict(title="Spending/Customer (R$)", len=0.6),
+                marker_size=15,  # Ukuran marker lebih kecil
+                geo=dict(
+                    showocean = True,
+                    oceancolor = 'rgb(204, 229, 255)',
+                    projection_scale=2.5,  # Zoom level lebih kecil
+                    lonaxis_range=[-75, -30],  # Batas longitude
+                    lataxis_range=[-35, 5],    # Batas latitude
+                )
+            )
+            
+        fig = self.cached_figure('customer_spending_map', state_data, build)
+            
         return fig, state_data
     
-    def create_time_period_revenue_analysis(self, data):
+    def time_period_data(self, data, cells):
+        """Revenue dan jumlah transaksi per periode: cube + distinct count exact atau estimasi"""
+        def compute():
+            return time_period_revenue(
+                cells,
+                self.count_distinct(data, 'order_id', by='time_period'),
+                self.count_distinct(data, 'customer_unique_id', by='time_period')
+            )
+        
+        return self.memoize('create_time_period_revenue_analysis', compute, getattr(self, 'approx_distinct', False))
+    
+    def create_time_period_revenue_analysis(self, data, cells):
         """Membuat analisis revenue berdasarkan periode waktu - SATU PIE CHART"""
         st.markdown("### 🕒 REVENUE BERDASARKAN PERIODE WAKTU")
         
-        # Hitung revenue per periode waktu
-        time_period_data = data.groupby('time_period').agg({
-            'price': ['sum', 'count'],
-            'order_id': 'nunique',
-            'customer_unique_id': 'nunique'
-        }).round(2)
-        
-        time_period_data.columns = ['total_revenue', 'transaction_count', 'unique_orders', 'unique_customer_unique_ids']
-        time_period_data = time_period_data.reset_index()
-        
-        # Hitung rata-rata revenue per order
-        time_period_data['avg_revenue_per_order'] = (time_period_data['total_revenue'] / time_period_data['unique_orders']).round(2)
-        
-        # Urutkan berdasarkan urutan waktu yang logis
-        time_order = ['Dini Hari (00:00-06:00)', 'Pagi (06:00-12:00)', 'Siang (12:00-18:00)', 'Malam (18:00-24:00)']
-        time_period_data['time_period'] = pd.Categorical(time_period_data['time_period'], categories=time_order, ordered=True)
-        time_period_data = time_period_data.sort_values('time_period')
-        
-        # SATU PIE CHART untuk distribusi revenue
-        fig_pie_revenue = px.pie(
-            time_period_data,
-            values='total_revenue',
-            names='time_period',
-            color='time_period',
-            color_discrete_map={
-                'Dini Hari (00:00-06:00)': '#4e54c8',
-                'Pagi (06:00-12:00)': '#ff9a00',
-                'Siang (12:00-18:00)': '#38ef7d',
-                'Malam (18:00-24:00)': '#ff416c'
-            }
-        )
+        time_period_data = self.time_period_data(data, cells)
+            
+        def build():
+            # SATU PIE CHART untuk distribusi revenue
+            fig_pie_revenue = px.pie(
+                time_period_data,
+                values='total_revenue',
+                names='time_period',
+                color='time_period',
+                color_discrete_map={
+                    'Dini Hari (00:00-06:00)': '#4e54c8',
+                    'Pagi (06:00-12:00)': '#ff9a00',
+                    'Siang (12:00-18:00)': '#38ef7d',
+                    'Malam (18:00-24:00)': '#ff416c'
+                }
+            )
+                
+            fig_pie_revenue.update_traces(
+                textposition='inside',
+                textinfo='percent+label',
+                hovertemplate="<b>%{label}</b><br>Revenue: R$ %{value:,.0f}<br>Persentase: %{percent}",
+                textfont=dict(size=12)
+            )
+                
+            fig_pie_revenue.update_layout(
+                height=400,
+                showlegend=False,  # Sembunyikan legend karena sudah ada di pie chart
+                margin=dict(t=50, b=50, l=20, r=20)
+            )
+            return fig_pie_revenue
+            
+        fig_pie_revenue = self.cached_figure('time_period_pie', time_period_data, build)
+            
+        st.plotly_chart(fig_pie_revenue, use_container_width=True)
+    
+    def monthly_cells(self, data):
+        """Cell aggregate bulanan untuk filter aktif"""
+        def compute():
+            if self.selected_time is not None:
+                # Aggregate bulanan tidak punya granularitas tanggal: cell dibangun dari baris terpilih
+                return build_monthly_cube(data)
+            if data is None:
+                return filter_cells(self.aggregates.monthly_cube, *self.selected_filter)
+            monthly_cube = self.dataset_cache.derived(self.dataset_key, 'monthly_cube', lambda: build_monthly_cube(self.df))
+            return filter_cells(monthly_cube, *self.selected_filter)
+        
+        return self.memoize('monthly_cells', compute)
+    
+    def monthly_trend_data(self, data, split=None, window=3):
+        """Trend bulanan total atau per state/kategori, dengan rolling window dan growth MoM"""
+        def compute():
+            if self.service_url:
+                params = {'window': window} if split is None else {'split': split, 'window': window}
+                return self.aggregates.query('monthly_trend', *self.selected_filter, **params)
+            return monthly_trend(self.monthly_cells(data), split, window)
+        
+        return self.memoize('monthly_trend', compute, split, window)
+    
+    def create_monthly_trend_chart(self, trend, metric, label, window):
+        """Line chart rolling per series; bar bulanan asli kalau hanya satu series"""
+        def build():
+            fig = go.Figure()
+            series_names = trend['series'].unique()
+            if len(series_names) == 1:
+                fig.add_trace(go.Bar(
+                    x=trend['month'], y=trend[metric], name=label,
+                    marker_color='#c6dbef', hovertemplate="%{x|%b %Y}<br>" + label + ": %{y:,.2f}<extra></extra>"
+                ))
+            for name in series_names:
+                series = trend[trend['series'] == name]
+                fig.add_trace(go.Scatter(
+                    x=series['month'], y=series[f'{metric}_rolling'], mode='lines+markers', name=str(name),
+                    hovertemplate="%{x|%b %Y}<br>" + f"Rolling {window} bulan" + ": %{y:,.2f}<extra></extra>"
+                ))
+            fig.update_layout(
+                height=400,
+                margin=dict(t=30, b=30, l=20, r=20),
+                yaxis_title=label,
+                legend=dict(orientation='h', y=-0.15),
+                hovermode='x unified'
+            )
+            return fig
         
-        fig_pie_revenue.update_traces(
-            textposition='inside',
-            textinfo='percent+label',
-            hovertemplate="<b>%{label}</b><br>Revenue: R$ %{value:,.0f}<br>Persentase: %{percent}",
-            textfont=dict(size=12)
-        )
+        return self.cached_figure(f'monthly_trend_{metric}_{window}', trend, build)
+    
+    def create_monthly_growth_chart(self, trend, metric, label):
+        """Bar chart growth month-over-month (%) per series"""
+        def build():
+            fig = px.bar(
+                trend,
+                x='month',
+                y=f'{metric}_growth',
+                color='series',
+                barmode='group',
+                labels={'month': 'Bulan', f'{metric}_growth': f'Growth {label} MoM (%)', 'series': ''}
+            )
+            fig.update_layout(
+                height=350,
+                margin=dict(t=30, b=30, l=20, r=20),
+                legend=dict(orientation='h', y=-0.2)
+            )
+            return fig
         
-        fig_pie_revenue.update_layout(
-            height=400,
-            showlegend=False,  # Sembunyikan legend karena sudah ada di pie chart
-            margin=dict(t=50, b=50, l=20, r=20)
+        return self.cached_figure(f'monthly_growth_{metric}', trend, build)
+    
+    def spending_segment_data(self, data):
+        """Statistik per segment spending dari tabel fakta customer"""
+        return self.customer_stats(
+            data, 'spending_segments', lambda facts: spending_segment_stats(facts, self.spending_distribution(data))
         )
-        
-        st.plotly_chart(fig_pie_revenue, use_container_width=True)
     
     def display_spending_segments(self, data):
         """Menampilkan segmentasi spending customer_unique_id dengan % distribusi"""
-        # Hitung spending per customer_unique_id
-        customer_unique_id_spending = data.groupby('customer_unique_id').agg({
-            'price': 'sum'
-        }).reset_index()
-        
-        total_customer_unique_ids = len(customer_unique_id_spending)
-        
-        # Definisikan segmentasi
-        def get_spending_segment(spending):
-            if spending < 100:
-                return 'Low (< R$ 100)'
-            elif spending < 500:
-                return 'Medium (R$ 100-500)'
-            elif spending < 2000:
-                return 'High (R$ 500-2000)'
-            else:
-                return 'VIP (> R$ 2000)'
-        
-        # Terapkan segmentasi
-        customer_unique_id_spending['segment'] = customer_unique_id_spending['price'].apply(get_spending_segment)
-        
-        # Hitung statistik per segment
-        segment_stats = customer_unique_id_spending.groupby('segment').agg({
-            'customer_unique_id': 'count',
-            'price': ['sum', 'mean', 'median']
-        }).round(2)
-        
-        segment_stats.columns = ['customer_unique_id_count', 'total_spending', 'avg_spending', 'median_spending']
-        segment_stats = segment_stats.reset_index()
-        
-        # Hitung persentase
-        segment_stats['percentage'] = (segment_stats['customer_unique_id_count'] / total_customer_unique_ids * 100).round(1)
-        
-        # Urutkan berdasarkan segment
-        segment_order = ['Low (< R$ 100)', 'Medium (R$ 100-500)', 'High (R$ 500-2000)', 'VIP (> R$ 2000)']
-        segment_stats['segment'] = pd.Categorical(segment_stats['segment'], categories=segment_order, ordered=True)
-        segment_stats = segment_stats.sort_values('segment')
+        segment_stats = self.spending_segment_data(data)
         
         # Tampilkan segment cards dengan persentase
         st.markdown("### 🎯 CUSTOMER SPENDING SEGMENTS")
         
-        for idx, row in segment_stats.iterrows():
-            segment_class = {
-                'Low (< R$ 100)': 'segment-low',
-                'Medium (R$ 100-500)': 'segment-medium', 
-                'High (R$ 500-2000)': 'segment-high',
-                'VIP (> R$ 2000)': 'segment-vip'
-            }[row['segment']]
-            
-            st.markdown(f"""
+        segment_classes = {
+            'Low (< R$ 100)': 'segment-low',
+            'Medium (R$ 100-500)': 'segment-medium', 
+            'High (R$ 500-2000)': 'segment-high',
+            'VIP (> R$ 2000)': 'segment-vip'
+        }
+        cards = segment_stats.assign(segment_class=segment_stats['segment'].astype(object).map(segment_classes))
+        
+        self.render_cards("""
             <div class="segment-card {segment_class}">
                 <div style="font-weight: bold; font-size: 1.1rem; margin-bottom: 0.5rem;">
-                    {row['segment']} <span style="font-size: 0.9rem; color: #6c757d;">({row['percentage']}%)</span>
+                    {segment} <span style="font-size: 0.9rem; color: #6c757d;">({percentage}%)</span>
                 </div>
                 <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem;">
                     <div>
                         <div style="font-size: 0.9rem; color: #6c757d;">Customers</div>
-                        <div style="font-weight: bold; font-size: 1.2rem;">{row['customer_unique_id_count']:,}</div>
+                        <div style="font-weight: bold; font-size: 1.2rem;">{customer_unique_id_count:,}</div>
                     </div>
                     <div>
                         <div style="font-size: 0.9rem; color: #6c757d;">Total Spending</div>
-                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {row['total_spending']:,.0f}</div>
+                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {total_spending:,.0f}</div>
                     </div>
                     <div>
                         <div style="font-size: 0.9rem; color: #6c757d;">Avg/Person</div>
-                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {row['avg_spending']:.2f}</div>
+                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {avg_spending:.2f}</div>
                     </div>
                 </div>
             </div>
-            """, unsafe_allow_html=True)
+            """, cards)
+    
+    def repeat_purchase_data(self, data):
+        """Statistik per segment repeat purchase dari tabel fakta customer"""
+        return self.customer_stats(data, 'repeat_purchase', repeat_purchase_stats)
     
     def display_repeat_purchase_analysis(self, data):
         """Menampilkan analisis repeat purchase berdasarkan segment - DIPERBAIKI"""
-        # Hitung jumlah order per customer_unique_id
-        customer_unique_id_orders = data.groupby('customer_unique_id').agg({
-            'order_id': 'nunique',
-            'price': 'sum'
-        }).reset_index()
-        
-        customer_unique_id_orders.columns = ['customer_unique_id', 'order_count', 'total_spending']
-        
-        total_customer_unique_ids = len(customer_unique_id_orders)
-        
-        # Definisikan segment repeat purchase - DIPERBAIKI dengan penjelasan
-        def get_repeat_segment(order_count):
-            if order_count == 1:
-                return 'One-time Buyer'
-            elif order_count <= 3:
-                return 'Occasional Buyer (2-3 orders)'
-            elif order_count <= 10:
-                return 'Regular Buyer (4-10 orders)'
-            else:
-                return 'Frequent Buyer (>10 orders)'
-        
-        # Terapkan segmentasi repeat purchase
-        customer_unique_id_orders['repeat_segment'] = customer_unique_id_orders['order_count'].apply(get_repeat_segment)
-        
-        # Hitung statistik per segment repeat
-        repeat_stats = customer_unique_id_orders.groupby('repeat_segment').agg({
-            'customer_unique_id': 'count',
-            'order_count': ['mean', 'sum'],  # DITAMBAH: total semua orders
-            'total_spending': ['sum', 'mean']
-        }).round(2)
-        
-        # Flatten column names
-        repeat_stats.columns = [
-            'customer_unique_id_count', 
-            'avg_orders_per_customer_unique_id', 
-            'total_orders',
-            'total_spending', 
-            'avg_spending_per_customer_unique_id'
-        ]
-        repeat_stats = repeat_stats.reset_index()
-        
-        # Hitung persentase customer_unique_id dan spending
-        repeat_stats['customer_unique_id_percentage'] = (repeat_stats['customer_unique_id_count'] / total_customer_unique_ids * 100).round(1)
-        repeat_stats['spending_percentage'] = (repeat_stats['total_spending'] / customer_unique_id_orders['total_spending'].sum() * 100).round(1)
-        
-        # Hitung nilai lifetime customer_unique_id
-        repeat_stats['avg_lifetime_value'] = (repeat_stats['total_spending'] / repeat_stats['customer_unique_id_count']).round(2)
-        
-        # Urutkan berdasarkan order count (bukan alphabet)
-        repeat_order = [
-            'One-time Buyer', 
-            'Occasional Buyer (2-3 orders)', 
-            'Regular Buyer (4-10 orders)', 
-            'Frequent Buyer (>10 orders)'
-        ]
-        repeat_stats['repeat_segment'] = pd.Categorical(
-            repeat_stats['repeat_segment'], 
-            categories=repeat_order, 
-            ordered=True
-        )
-        repeat_stats = repeat_stats.sort_values('repeat_segment')
+        repeat_stats, total_customer_unique_ids, avg_orders = self.repeat_purchase_data(data)
         
         # Tampilkan repeat purchase segments - DIPERBAIKI dengan metrik tambahan
         st.markdown("### 🔄 REPEAT PURCHASE SEGMENTS")
@@ -719,7 +912,6 @@ class FinalCleanBrazilEcommerceDashboard:
             self.create_mini_metric(f"{repeat_rate}%", "Customer Repeat Rate", "🔄")
         
         with col2:
-            avg_orders = customer_unique_id_orders['order_count'].mean().round(2)
             self.create_mini_metric(f"{avg_orders}", "Rata-rata Orders/Customer", "📊")
         
         with col3:
@@ -732,35 +924,34 @@ class FinalCleanBrazilEcommerceDashboard:
             self.create_mini_metric(f"{total_repeat_orders:,}", "Total Repeat Orders", "📦")
         
         # Tampilkan segment cards dengan metrik yang lebih lengkap
-        for idx, row in repeat_stats.iterrows():
-            st.markdown(f"""
+        self.render_cards("""
             <div class="repeat-card">
                 <div style="font-weight: bold; font-size: 1.1rem; margin-bottom: 0.5rem;">
-                    {row['repeat_segment']} 
+                    {repeat_segment} 
                     <span style="font-size: 0.9rem; color: #6c757d;">
-                        ({row['customer_unique_id_percentage']}% customers, {row['spending_percentage']}% revenue)
+                        ({customer_unique_id_percentage}% customers, {spending_percentage}% revenue)
                     </span>
                 </div>
                 <div style="display: grid; grid-template-columns: 1fr 1fr 1fr 1fr; gap: 1rem;">
                     <div>
                         <div style="font-size: 0.9rem; color: #6c757d;">Customers</div>
-                        <div style="font-weight: bold; font-size: 1.2rem;">{row['customer_unique_id_count']:,}</div>
+                        <div style="font-weight: bold; font-size: 1.2rem;">{customer_unique_id_count:,}</div>
                     </div>
                     <div>
                         <div style="font-size: 0.9rem; color: #6c757d;">Total Orders</div>
-                        <div style="font-weight: bold; font-size: 1.2rem;">{row['total_orders']:,}</div>
+                        <div style="font-weight: bold; font-size: 1.2rem;">{total_orders:,}</div>
                     </div>
                     <div>
                         <div style="font-size: 0.9rem; color: #6c757d;">Total Spending</div>
-                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {row['total_spending']:,.0f}</div>
+                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {total_spending:,.0f}</div>
                     </div>
                     <div>
                         <div style="font-size: 0.9rem; color: #6c757d;">LTV/Customer</div>
-                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {row['avg_lifetime_value']:,.0f}</div>
+                        <div style="font-weight: bold; font-size: 1.2rem;">R$ {avg_lifetime_value:,.0f}</div>
                     </div>
                 </div>
             </div>
-            """, unsafe_allow_html=True)
+            """, repeat_stats)
         
         # Tambahkan insights
         st.markdown("#### 💡 INSIGHTS REPEAT PURCHASE:")
@@ -778,22 +969,13 @@ class FinalCleanBrazilEcommerceDashboard:
         with col_insight2:
             st.info(f"**💰 Revenue Impact:** Repeat customers menyumbang R$ {revenue_from_repeaters:,.0f} ({repeat_stats['spending_percentage'].sum() - repeat_stats.iloc[0]['spending_percentage']:.1f}%) dari total revenue")
     
-    def display_state_ranking_vertical(self, data, score_type='review'):
+    def state_ranking_data(self, cells, score_type='review'):
+        """Rollup cube per state untuk ranking (review: score = 0 tidak ikut rata-rata)"""
+        return self.memoize('display_state_ranking_vertical', lambda: state_ranking_scores(cells, score_type), score_type)
+    
+    def display_state_ranking_vertical(self, cells, score_type='review'):
         """Menampilkan ranking state secara vertikal"""
-        # Aggregate data per state
-        if 'customer_state_full' in data.columns:
-            state_col = 'customer_state_full'
-        else:
-            state_col = 'nama_state'
-        
-        if score_type == 'review':
-            # PERBAIKAN: Filter out review_score = 0 sebelum menghitung rata-rata
-            valid_reviews = data[data['review_score'] > 0]
-            state_scores = valid_reviews.groupby(state_col)['review_score'].mean().round(3).reset_index()
-            state_scores.columns = ['state', 'score']
-        else:  # revenue
-            state_scores = data.groupby(state_col).agg({'price': 'sum'}).round(0).reset_index()
-            state_scores.columns = ['state', 'score']
+        state_scores = self.state_ranking_data(cells, score_type)
         
         # Top 5 dan Bottom 5
         top_5 = state_scores.nlargest(5, 'score')
@@ -810,92 +992,63 @@ class FinalCleanBrazilEcommerceDashboard:
         
         col1, col2 = st.columns(2)
         
+        score_format = "{score:.2f}" if score_type == 'review' else "R$ {score:,.0f}"
+        
         with col1:
             st.markdown("**TOP 2-5**")
-            for i in range(1, min(5, len(top_5))):
-                state = top_5.iloc[i]
-                score_display = f"{state['score']:.2f}" if score_type == 'review' else f"R$ {state['score']:,.0f}"
-                st.markdown(f"<div class='ranking-item-top'>"
-                           f"<span class='ranking-number'>#{i+1}</span>"
-                           f"<span class='ranking-name'>{state['state']}</span>"
-                           f"<span class='ranking-score'>{score_display}</span>"
-                           f"</div>", unsafe_allow_html=True)
+            top_rest = top_5.iloc[1:5]
+            self.render_ranking_items(top_rest, 'state', score_format, np.arange(2, len(top_rest) + 2))
         
         with col2:
             st.markdown("**BOTTOM 5**")
-            for i in range(min(5, len(bottom_5))):
-                state = bottom_5.iloc[i]
-                score_display = f"{state['score']:.2f}" if score_type == 'review' else f"R$ {state['score']:,.0f}"
-                st.markdown(f"<div class='ranking-item-bottom'>"
-                           f"<span class='ranking-number'>#{len(state_scores)-4+i}</span>"
-                           f"<span class='ranking-name'>{state['state']}</span>"
-                           f"<span class='ranking-score-bad'>{score_display}</span>"
-                           f"</div>", unsafe_allow_html=True)
+            self.render_ranking_items(bottom_5, 'state', score_format,
+                                      np.arange(len(bottom_5)) + len(state_scores) - 4, bottom=True)
     
-    def display_product_rankings(self, data):
+    def display_product_rankings(self, data, cells):
         """Menampilkan ranking produk berdasarkan review dan revenue"""
-        if 'product_category_name_english' not in data.columns:
+        if 'product_category_name_english' not in cells.columns:
             st.warning("Data kategori produk tidak tersedia")
             return
         
+        category_facts = self.category_facts(data, cells)
+        
+        # PERBAIKAN: review_score = 0 tidak ikut rata-rata
+        category_review = category_facts.loc[category_facts['review_count'] > 0, ['category', 'avg_review']]
+        category_review.columns = ['product_category_name_english', 'review_score']
+        
+        # Revenue ranking
+        category_revenue = category_facts[['category', 'total_revenue']]
+        category_revenue.columns = ['product_category_name_english', 'price']
+        
+        # 🚨 FILTER MINIMUM ORDER DIHAPUS - semua kategori akan ditampilkan
+        
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("**📦 TOP 5 KATEGORI - REVIEW**")
-            # PERBAIKAN: Filter out review_score = 0 sebelum menghitung rata-rata
-            valid_reviews = data[data['review_score'] > 0]
-            category_review = valid_reviews.groupby('product_category_name_english')['review_score'].mean().round(3).reset_index()
-            category_review = category_review[category_review['review_score'].notna()]
-            category_review = category_review[category_review['product_category_name_english'].notna()]
-            
-            # 🚨 FILTER MINIMUM ORDER DIHAPUS - semua kategori akan ditampilkan
-            
             top_5_review = category_review.nlargest(5, 'review_score')
             bottom_5_review = category_review.nsmallest(5, 'review_score')
             
-            for i, (idx, row) in enumerate(top_5_review.iterrows(), 1):
-                st.markdown(f"<div class='ranking-item-top'>"
-                           f"<span class='ranking-number'>#{i}</span>"
-                           f"<span class='ranking-name'>{row['product_category_name_english']}</span>"
-                           f"<span class='ranking-score'>{row['review_score']:.2f}</span>"
-                           f"</div>", unsafe_allow_html=True)
+            self.render_ranking_items(top_5_review, 'product_category_name_english', "{review_score:.2f}",
+                                      np.arange(1, len(top_5_review) + 1))
             
             st.markdown("---")
             st.markdown("**📉 BOTTOM 5 KATEGORI - REVIEW**")
-            for i, (idx, row) in enumerate(bottom_5_review.iterrows(), 1):
-                st.markdown(f"<div class='ranking-item-bottom'>"
-                           f"<span class='ranking-number'>#{i}</span>"
-                           f"<span class='ranking-name'>{row['product_category_name_english']}</span>"
-                           f"<span class='ranking-score-bad'>{row['review_score']:.2f}</span>"
-                           f"</div>", unsafe_allow_html=True)
+            self.render_ranking_items(bottom_5_review, 'product_category_name_english', "{review_score:.2f}",
+                                      np.arange(1, len(bottom_5_review) + 1), bottom=True)
         
         with col2:
             st.markdown("**💰 TOP 5 KATEGORI - REVENUE**")
-            # Revenue ranking
-            category_revenue = data.groupby('product_category_name_english')['price'].sum().round(0).reset_index()
-            category_revenue = category_revenue[category_revenue['price'].notna()]
-            category_revenue = category_revenue[category_revenue['product_category_name_english'].notna()]
-            
-            # 🚨 FILTER MINIMUM ORDER DIHAPUS - semua kategori akan ditampilkan
-            
             top_5_revenue = category_revenue.nlargest(5, 'price')
             bottom_5_revenue = category_revenue.nsmallest(5, 'price')
             
-            for i, (idx, row) in enumerate(top_5_revenue.iterrows(), 1):
-                st.markdown(f"<div class='ranking-item-top'>"
-                           f"<span class='ranking-number'>#{i}</span>"
-                           f"<span class='ranking-name'>{row['product_category_name_english']}</span>"
-                           f"<span class='ranking-score'>R$ {row['price']:,.0f}</span>"
-                           f"</div>", unsafe_allow_html=True)
+            self.render_ranking_items(top_5_revenue, 'product_category_name_english', "R$ {price:,.0f}",
+                                      np.arange(1, len(top_5_revenue) + 1))
             
             st.markdown("---")
             st.markdown("**📊 BOTTOM 5 KATEGORI - REVENUE**")
-            for i, (idx, row) in enumerate(bottom_5_revenue.iterrows(), 1):
-                st.markdown(f"<div class='ranking-item-bottom'>"
-                           f"<span class='ranking-number'>#{i}</span>"
-                           f"<span class='ranking-name'>{row['product_category_name_english']}</span>"
-                           f"<span class='ranking-score-bad'>R$ {row['price']:,.0f}</span>"
-                           f"</div>", unsafe_allow_html=True)
+            self.render_ranking_items(bottom_5_revenue, 'product_category_name_english', "R$ {price:,.0f}",
+                                      np.arange(1, len(bottom_5_revenue) + 1), bottom=True)
     
     def create_simple_trendline(self, x, y):
         """Membuat trendline sederhana menggunakan linear regression"""
@@ -908,39 +1061,18 @@ class FinalCleanBrazilEcommerceDashboard:
             # Fallback jika error
             return y
     
-    def create_review_revenue_correlation_analysis(self, data):
+    def create_review_revenue_correlation_analysis(self, data, cells):
         """Membuat analisis korelasi antara review score dan revenue"""
-        if 'product_category_name_english' not in data.columns:
+        if 'product_category_name_english' not in cells.columns:
             st.warning("Data kategori produk tidak tersedia untuk analisis korelasi")
             return
         
         st.markdown("### 📈 KORELASI REVIEW SCORE DAN REVENUE")
         
-        # PERBAIKAN: Filter out review_score = 0 hanya untuk perhitungan review score, tapi revenue tetap semua data
-        valid_reviews = data[data['review_score'] > 0]
-        
-        # PERBAIKAN: Filter kategori dengan minimal 10 order - gunakan data lengkap untuk revenue
-        category_order_counts = data.groupby('product_category_name_english')['order_id'].nunique()  # Gunakan data lengkap
-        categories_with_min_orders = category_order_counts[category_order_counts >= 10].index.tolist()
-        
-        # Filter data untuk review (hanya yang valid) dan revenue (semua data)
-        # Untuk review: gunakan valid_reviews
-        # Untuk revenue: gabungkan data review valid dengan data revenue lengkap
-        review_data = valid_reviews[valid_reviews['product_category_name_english'].isin(categories_with_min_orders)]
-        revenue_data = data[data['product_category_name_english'].isin(categories_with_min_orders)]
-        
-        # Aggregate data per kategori produk - review dari data valid, revenue dari semua data
-        category_review = review_data.groupby('product_category_name_english')['review_score'].mean().round(3).reset_index()
-        category_revenue = revenue_data.groupby('product_category_name_english')['price'].sum().round(0).reset_index()
-        
-        # Gabungkan data review dan revenue
-        category_data = pd.merge(category_review, category_revenue, on='product_category_name_english', how='inner')
-        category_data.columns = ['category', 'avg_review', 'total_revenue']
-        
-        # Tambahkan order count dari data lengkap
-        order_counts = revenue_data.groupby('product_category_name_english')['order_id'].nunique().reset_index()
-        order_counts.columns = ['category', 'order_count']
-        category_data = pd.merge(category_data, order_counts, on='category', how='inner')
+        # Kategori dengan minimal 10 order dari tabel fakta kategori
+        # PERBAIKAN: review score hanya dari score > 0, revenue tetap semua data
+        category_facts = self.category_facts(data, cells)
+        category_data = correlation_categories(category_facts)
         
         if len(category_data) == 0:
             st.warning("Tidak ada kategori dengan minimal 10 order untuk analisis korelasi")
@@ -982,7 +1114,7 @@ class FinalCleanBrazilEcommerceDashboard:
             
         with col4:
             # Tampilkan informasi tentang filter minimal order
-            total_categories = data['product_category_name_english'].nunique()  # Gunakan data lengkap
+            total_categories = len(category_facts)  # Semua kategori di data terfilter
             excluded_categories = total_categories - len(category_data)
             st.metric(
                 "Kategori Dikecualikan", 
@@ -997,135 +1129,127 @@ class FinalCleanBrazilEcommerceDashboard:
         # SCATTER PLOT 1: Semua Produk
         st.markdown("#### 🔍 SCATTER PLOT: SEMUA KATEGORI PRODUK (Min. 10 Order)")
         
-        # Buat scatter plot tanpa trendline LOWESS
-        fig_all = px.scatter(
-            category_data, 
-            x='avg_review', 
-            y='total_revenue',
-            size='order_count',
-            hover_name='category',
-            hover_data={
-                'avg_review': ':.2f',
-                'total_revenue': ':,.0f',
-                'order_count': True
-            },
-            title='Korelasi Review Score vs Revenue - Semua Kategori (Min. 10 Order)',
-            labels={
-                'avg_review': 'Rata-rata Review Score',
-                'total_revenue': 'Total Revenue (R$)',
-                'order_count': 'Jumlah Order'
-            }
-        )
-        
-        # Tambahkan trendline sederhana menggunakan linear regression
-        try:
-            x_vals = category_data['avg_review'].values
-            y_vals = category_data['total_revenue'].values
-            
-            # Urutkan berdasarkan x untuk trendline yang rapi
-            sort_idx = np.argsort(x_vals)
-            x_sorted = x_vals[sort_idx]
-            y_sorted = y_vals[sort_idx]
-            
-            # Buat trendline
-            trendline_vals = self.create_simple_trendline(x_sorted, y_sorted)
+        def build_all():
+            # Buat scatter plot tanpa trendline LOWESS
+            fig_all = px.scatter(
+                category_data, 
+                x='avg_review', 
+                y='total_revenue',
+                size='order_count',
+                hover_name='category',
+                hover_data={
+                    'avg_review': ':.2f',
+                    'total_revenue': ':,.0f',
+                    'order_count': True
+                },
+                title='Korelasi Review Score vs Revenue - Semua Kategori (Min. 10 Order)',
+                labels={
+                    'avg_review': 'Rata-rata Review Score',
+                    'total_revenue': 'Total Revenue (R$)',
+                    'order_count': 'Jumlah Order'
+                }
+            )
             
-            fig_all.add_trace(
-                go.Scatter(
-                    x=x_sorted,
-                    y=trendline_vals,
-                    mode='lines',
-                    name='Trendline',
-                    line=dict(color='red', dash='dash'),
-                    hoverinfo='skip'
+            # Tambahkan trendline sederhana menggunakan linear regression
+            trendline_error = None
+            try:
+                x_vals = category_data['avg_review'].values
+                y_vals = category_data['total_revenue'].values
+                
+                # Urutkan berdasarkan x untuk trendline yang rapi
+                sort_idx = np.argsort(x_vals)
+                x_sorted = x_vals[sort_idx]
+                y_sorted = y_vals[sort_idx]
+                
+                # Buat trendline
+                trendline_vals = self.create_simple_trendline(x_sorted, y_sorted)
+                
+                fig_all.add_trace(
+                    go.Scatter(
+                        x=x_sorted,
+                        y=trendline_vals,
+                        mode='lines',
+                        name='Trendline',
+                        line=dict(color='red', dash='dash'),
+                        hoverinfo='skip'
+                    )
                 )
+            except Exception as e:
+                trendline_error = str(e)
+            
+            fig_all.update_layout(
+                height=500,
+                showlegend=True
             )
-        except Exception as e:
-            st.warning(f"Tidak dapat menambahkan trendline: {str(e)}")
+            return fig_all, trendline_error
         
-        fig_all.update_layout(
-            height=500,
-            showlegend=True
-        )
+        fig_all, trendline_error = self.cached_figure('correlation_all', category_data, build_all)
+        if trendline_error is not None:
+            st.warning(f"Tidak dapat menambahkan trendline: {trendline_error}")
         
         st.plotly_chart(fig_all, use_container_width=True)
         
         # SCATTER PLOT 2: Top 5 Review dan Revenue
         st.markdown("#### 🏆 SCATTER PLOT: TOP 5 KATEGORI REVIEW & REVENUE (Min. 10 Order)")
         
-        # Ambil top 5 dari masing-masing kategori
-        top_5_review_cats = category_data.nlargest(5, 'avg_review')['category'].tolist()
-        top_5_revenue_cats = category_data.nlargest(5, 'total_revenue')['category'].tolist()
-        
-        # Gabungkan dan hapus duplikat
-        top_cats = list(set(top_5_review_cats + top_5_revenue_cats))
-        top_categories_data = category_data[category_data['category'].isin(top_cats)]
-        
-        # Buat scatter plot untuk top categories
-        fig_top = px.scatter(
-            top_categories_data, 
-            x='avg_review', 
-            y='total_revenue',
-            size='order_count',
-            hover_name='category',
-            hover_data={
-                'avg_review': ':.2f',
-                'total_revenue': ':,.0f',
-                'order_count': True
-            },
-            title='Korelasi Review Score vs Revenue - Top Kategori (Min. 10 Order)',
-            labels={
-                'avg_review': 'Rata-rata Review Score',
-                'total_revenue': 'Total Revenue (R$)',
-                'order_count': 'Jumlah Order'
-            },
-            color='category'  # Warna berbeda untuk setiap kategori
-        )
-        
-        fig_top.update_layout(
-            height=500,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=-0.3,
-                xanchor="center",
-                x=0.5
+        def build_top():
+            # Ambil top 5 dari masing-masing kategori
+            top_5_review_cats = category_data.nlargest(5, 'avg_review')['category'].tolist()
+            top_5_revenue_cats = category_data.nlargest(5, 'total_revenue')['category'].tolist()
+            
+            # Gabungkan dan hapus duplikat
+            top_cats = list(set(top_5_review_cats + top_5_revenue_cats))
+            top_categories_data = category_data[category_data['category'].isin(top_cats)]
+            
+            # Buat scatter plot untuk top categories
+            fig_top = px.scatter(
+                top_categories_data, 
+                x='avg_review', 
+                y='total_revenue',
+                size='order_count',
+                hover_name='category',
+                hover_data={
+                    'avg_review': ':.2f',
+                    'total_revenue': ':,.0f',
+                    'order_count': True
+                },
+                title='Korelasi Review Score vs Revenue - Top Kategori (Min. 10 Order)',
+                labels={
+                    'avg_review': 'Rata-rata Review Score',
+                    'total_revenue': 'Total Revenue (R$)',
+                    'order_count': 'Jumlah Order'
+                },
+                color='category'  # Warna berbeda untuk setiap kategori
             )
-        )
+            
+            fig_top.update_layout(
+                height=500,
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=-0.3,
+                    xanchor="center",
+                    x=0.5
+                )
+            )
+            return fig_top
+        
+        fig_top = self.cached_figure('correlation_top', category_data, build_top)
         
         st.plotly_chart(fig_top, use_container_width=True)
     
-    def create_review_revenue_insights(self, data):
+    def create_review_revenue_insights(self, data, cells):
         """Membuat insights terpisah untuk PERFORMER TERBAIK dan PELUANG BISNIS"""
-        if 'product_category_name_english' not in data.columns:
+        if 'product_category_name_english' not in cells.columns:
             st.warning("Data kategori produk tidak tersedia untuk analisis insights")
             return
         
         st.markdown("### 💡 INSIGHTS REVIEW DAN REVENUE")
         
-        # PERBAIKAN: Filter out review_score = 0 hanya untuk perhitungan review score, tapi revenue tetap semua data
-        valid_reviews = data[data['review_score'] > 0]
-        
-        # Filter kategori dengan minimal 10 order - gunakan data lengkap untuk revenue
-        category_order_counts = data.groupby('product_category_name_english')['order_id'].nunique()  # Gunakan data lengkap
-        categories_with_min_orders = category_order_counts[category_order_counts >= 10].index.tolist()
-        
-        # Filter data untuk review (hanya yang valid) dan revenue (semua data)
-        review_data = valid_reviews[valid_reviews['product_category_name_english'].isin(categories_with_min_orders)]
-        revenue_data = data[data['product_category_name_english'].isin(categories_with_min_orders)]
-        
-        # Aggregate data per kategori produk - review dari data valid, revenue dari semua data
-        category_review = review_data.groupby('product_category_name_english')['review_score'].mean().round(3).reset_index()
-        category_revenue = revenue_data.groupby('product_category_name_english')['price'].sum().round(0).reset_index()
-        
-        # Gabungkan data review dan revenue
-        category_data = pd.merge(category_review, category_revenue, on='product_category_name_english', how='inner')
-        category_data.columns = ['category', 'avg_review', 'total_revenue']
-        
-        # Tambahkan order count dari data lengkap
-        order_counts = revenue_data.groupby('product_category_name_english')['order_id'].nunique().reset_index()
-        order_counts.columns = ['category', 'order_count']
-        category_data = pd.merge(category_data, order_counts, on='category', how='inner')
+        # Kategori dengan minimal 10 order dari tabel fakta kategori
+        # PERBAIKAN: review score hanya dari score > 0, revenue tetap semua data
+        category_facts = self.category_facts(data, cells)
+        category_data = correlation_categories(category_facts)
         
         if len(category_data) == 0:
             st.warning("Tidak ada kategori dengan minimal 10 order untuk analisis insights")
@@ -1154,26 +1278,25 @@ class FinalCleanBrazilEcommerceDashboard:
             st.markdown("#### ✅ PERFORMER TERBAIK")
             st.markdown("Kategori dengan **review tinggi** dan **revenue tinggi**:")
             if len(best_performers) > 0:
-                for _, product in best_performers.head(5).iterrows():
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(90deg, #d4edda, white); padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem; border-left: 4px solid #28a745;">
-                        <div style="font-weight: bold; font-size: 1.1rem; color: #155724;">{product['category']}</div>
-                        <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 0.5rem; margin-top: 0.5rem;">
-                            <div>
-                                <div style="font-size: 0.8rem; color: #6c757d;">Review Score</div>
-                                <div style="font-weight: bold; color: #28a745;">⭐ {product['avg_review']:.2f}</div>
-                            </div>
-                            <div>
-                                <div style="font-size: 0.8rem; color: #6c757d;">Revenue</div>
-                                <div style="font-weight: bold; color: #007bff;">💰 R$ {product['total_revenue']:,.0f}</div>
-                            </div>
-                            <div>
-                                <div style="font-size: 0.8rem; color: #6c757d;">Orders</div>
-                                <div style="font-weight: bold; color: #6c757d;">📦 {product['order_count']}</div>
-                            </div>
+                self.render_cards("""
+                <div style="background: linear-gradient(90deg, #d4edda, white); padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem; border-left: 4px solid #28a745;">
+                    <div style="font-weight: bold; font-size: 1.1rem; color: #155724;">{category}</div>
+                    <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 0.5rem; margin-top: 0.5rem;">
+                        <div>
+                            <div style="font-size: 0.8rem; color: #6c757d;">Review Score</div>
+                            <div style="font-weight: bold; color: #28a745;">⭐ {avg_review:.2f}</div>
+                        </div>
+                        <div>
+                            <div style="font-size: 0.8rem; color: #6c757d;">Revenue</div>
+                            <div style="font-weight: bold; color: #007bff;">💰 R$ {total_revenue:,.0f}</div>
+                        </div>
+                        <div>
+                            <div style="font-size: 0.8rem; color: #6c757d;">Orders</div>
+                            <div style="font-weight: bold; color: #6c757d;">📦 {order_count}</div>
                         </div>
                     </div>
-                    """, unsafe_allow_html=True)
+                </div>
+                """, best_performers.head(5))
             else:
                 st.markdown("*Tidak ada kategori yang masuk kriteria*")
         
@@ -1181,117 +1304,276 @@ class FinalCleanBrazilEcommerceDashboard:
             st.markdown("#### 🎯 PELUANG BISNIS")
             st.markdown("Kategori dengan **review tinggi** tapi **revenue rendah**:")
             if len(high_review_low_revenue) > 0:
-                for _, product in high_review_low_revenue.head(5).iterrows():
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(90deg, #fff3cd, white); padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem; border-left: 4px solid #ffc107;">
-                        <div style="font-weight: bold; font-size: 1.1rem; color: #856404;">{product['category']}</div>
-                        <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 0.5rem; margin-top: 0.5rem;">
-                            <div>
-                                <div style="font-size: 0.8rem; color: #6c757d;">Review Score</div>
-                                <div style="font-weight: bold; color: #28a745;">⭐ {product['avg_review']:.2f}</div>
-                            </div>
-                            <div>
-                                <div style="font-size: 0.8rem; color: #6c757d;">Revenue</div>
-                                <div style="font-weight: bold; color: #dc3545;">💰 R$ {product['total_revenue']:,.0f}</div>
-                            </div>
-                            <div>
-                                <div style="font-size: 0.8rem; color: #6c757d;">Orders</div>
-                                <div style="font-weight: bold; color: #6c757d;">📦 {product['order_count']}</div>
-                            </div>
+                self.render_cards("""
+                <div style="background: linear-gradient(90deg, #fff3cd, white); padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem; border-left: 4px solid #ffc107;">
+                    <div style="font-weight: bold; font-size: 1.1rem; color: #856404;">{category}</div>
+                    <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 0.5rem; margin-top: 0.5rem;">
+                        <div>
+                            <div style="font-size: 0.8rem; color: #6c757d;">Review Score</div>
+                            <div style="font-weight: bold; color: #28a745;">⭐ {avg_review:.2f}</div>
+                        </div>
+                        <div>
+                            <div style="font-size: 0.8rem; color: #6c757d;">Revenue</div>
+                            <div style="font-weight: bold; color: #dc3545;">💰 R$ {total_revenue:,.0f}</div>
+                        </div>
+                        <div>
+                            <div style="font-size: 0.8rem; color: #6c757d;">Orders</div>
+                            <div style="font-weight: bold; color: #6c757d;">📦 {order_count}</div>
                         </div>
                     </div>
-                    """, unsafe_allow_html=True)
+                </div>
+                """, high_review_low_revenue.head(5))
             else:
                 st.markdown("*Tidak ada kategori yang masuk kriteria*")
     
+    def render_review_tab(self, data, cells):
+        """Render tab review analysis"""
+        # Metrics expandable
+        self.display_minimal_review_metrics(cells)
+        
+        # Layout utama
+        col1, col2 = st.columns([3, 2])
+        
+        with col1:
+            st.markdown("**🗺️ PETA REVIEW BRAZIL**")
+            fig, state_data = self.create_simple_map(cells, 'review')
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            st.markdown("**🏆 RANKING STATE**")
+            self.display_state_ranking_vertical(cells, 'review')
+    
+    def render_revenue_tab(self, data, cells):
+        """Render tab revenue analysis"""
+        # Metrics expandable
+        self.display_minimal_revenue_metrics(data, cells)
+        
+        # Layout utama
+        col1, col2 = st.columns([3, 2])
+        
+        with col1:
+            st.markdown("**🗺️ PETA REVENUE BRAZIL**")
+            fig, state_data = self.create_simple_map(cells, 'revenue')
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            st.markdown("**🏆 RANKING STATE**")
+            self.display_state_ranking_vertical(cells, 'revenue')
+    
+    def render_product_tab(self, data, cells):
+        """Render tab product analysis beserta subtab-nya"""
+        st.markdown("### 📦 PRODUCT PERFORMANCE ANALYSIS")
+        
+        # Tab untuk product analysis
+        subtabs = {
+            "🏆 PRODUCT RANKINGS": self.display_product_rankings,
+            "📈 REVIEW-REVENUE CORRELATION": self.create_review_revenue_correlation_analysis,
+            "💡 INSIGHTS REVIEW-REVENUE": self.create_review_revenue_insights
+        }
+        
+        for label, container in self.tab_containers(list(subtabs), 'active_product_tab'):
+            with container:
+                subtabs[label](data, cells)
+    
+    def render_customer_tab(self, data, cells):
+        """Render tab customer analysis"""
+        # Metrics untuk customer spending
+        self.display_customer_spending_metrics(data)
+        
+        st.markdown("---")
+        
+        # Layout untuk customer analysis - BERDAMPINGAN
+        col_map, col_time = st.columns([2, 1])
+        
+        with col_map:
+            st.markdown("**🗺️ PETA SPENDING PER CUSTOMER - BRAZIL**")
+            fig, state_data = self.create_customer_spending_map(data, cells)
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col_time:
+            # Tambahkan analisis revenue berdasarkan waktu di sini
+            self.create_time_period_revenue_analysis(data, cells)
+        
+        # Spending segments dan repeat purchase analysis di bawah peta
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            self.display_spending_segments(data)
+        
+        with col2:
+            self.display_repeat_purchase_analysis(data)
+    
+    def render_trend_tab(self, data, cells):
+        """Render tab trend bulanan"""
+        st.markdown("### 📈 TREND BULANAN")
+        
+        metrics = {'revenue': 'Revenue (R$)', 'orders': 'Jumlah Order', 'avg_review': 'Rata-rata Review'}
+        splits = {'Total': None, 'Per State': 'nama_state', 'Per Kategori': 'product_category_name_english'}
+        if 'product_category_name_english' not in cells.columns:
+            del splits['Per Kategori']
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            metric = st.selectbox("**Metric:**", options=list(metrics), format_func=metrics.get)
+        with col2:
+            split = splits[st.selectbox("**Tampilkan:**", options=list(splits), help="Per state/kategori: 5 teratas berdasarkan revenue")]
+        with col3:
+            window = st.selectbox(
+                "**Rolling Window:**",
+                options=TREND_WINDOWS,
+                index=TREND_WINDOWS.index(3),
+                format_func=lambda months: f"{months} bulan"
+            )
+        
+        trend = self.monthly_trend_data(data, split, window)
+        if trend.empty:
+            st.info("Tidak ada transaksi untuk filter ini")
+            return
+        
+        # Mini metrics bulan terakhir dari trend total
+        last = self.monthly_trend_data(data, None, window).iloc[-1]
+        month_label = f"{MONTH_LABELS[last['month'].month - 1]} {last['month'].year}"
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            self.create_mini_metric(f"R$ {last['revenue']:,.0f}", f"Revenue {month_label}", "💰")
+        with col2:
+            self.create_mini_metric(f"{last['orders']:,.0f}", f"Order {month_label}", "🛒")
+        with col3:
+            growth = last[f'{metric}_growth']
+            self.create_mini_metric("-" if pd.isna(growth) else f"{growth:+.1f}%", f"Growth {metrics[metric]} MoM", "📊")
+        
+        st.markdown(f"**{metrics[metric].upper()} (ROLLING {window} BULAN)**")
+        st.plotly_chart(self.create_monthly_trend_chart(trend, metric, metrics[metric], window), use_container_width=True)
+        
+        st.markdown("**GROWTH MONTH-OVER-MONTH**")
+        st.plotly_chart(self.create_monthly_growth_chart(trend, metric, metrics[metric]), use_container_width=True)
+    
+    def review_tab_aggregates(self, data, cells):
+        """Aggregate tab review (tanpa render), urut layout"""
+        return [
+            lambda: self.state_map_data(cells, 'review'),
+            lambda: self.state_ranking_data(cells, 'review')
+        ]
+    
+    def revenue_tab_aggregates(self, data, cells):
+        """Aggregate tab revenue (tanpa render), urut layout"""
+        return [
+            lambda: self.count_distinct(data, 'order_id'),
+            lambda: self.count_distinct(data, 'customer_unique_id'),
+            lambda: self.state_map_data(cells, 'revenue'),
+            lambda: self.state_ranking_data(cells, 'revenue')
+        ]
+    
+    def product_tab_aggregates(self, data, cells):
+        """Aggregate tab product (tanpa render): semua subtab memakai tabel fakta kategori"""
+        if 'product_category_name_english' not in cells.columns:
+            return []
+        return [lambda: self.category_facts(data, cells)]
+    
+    def customer_tab_aggregates(self, data, cells):
+        """Aggregate tab customer (tanpa render), urut layout.
+        
+        View yang memakai tabel fakta customer menunggu tabel yang sama lewat
+        result_cache, tidak menghitung ulang.
+        """
+        return [
+            lambda: self.customer_spending_data(data),
+            lambda: self.spending_percentile_data(data),
+            lambda: self.customer_spending_map_data(data, cells),
+            lambda: self.time_period_data(data, cells),
+            lambda: self.spending_segment_data(data),
+            lambda: self.repeat_purchase_data(data)
+        ]
+    
+    def trend_tab_aggregates(self, data, cells):
+        """Aggregate tab trend (tanpa render): trend total default, split lain dihitung saat dipilih"""
+        return [lambda: self.monthly_trend_data(data)]
+    
+    def register_tabs(self):
+        """Registry tab: label -> (render, aggregates)"""
+        return {
+            "⭐ REVIEW ANALYSIS": (self.render_review_tab, self.review_tab_aggregates),
+            "💰 REVENUE ANALYSIS": (self.render_revenue_tab, self.revenue_tab_aggregates),
+            "📦 PRODUCT ANALYSIS": (self.render_product_tab, self.product_tab_aggregates),
+            "👥 CUSTOMER ANALYSIS": (self.render_customer_tab, self.customer_tab_aggregates),
+            "📈 TREND ANALYSIS": (self.render_trend_tab, self.trend_tab_aggregates)
+        }
+    
+    def tab_containers(self, labels, key):
+        """Pasangan (label, container) untuk tab yang perlu dirender.
+        
+        Default: semua tab lewat st.tabs. Mode lazy (opt-in): navigasi radio,
+        hanya tab yang dipilih yang dirender dan dihitung.
+        """
+        if not self.lazy_tabs:
+            return list(zip(labels, st.tabs(labels)))
+        
+        selected = st.radio("Navigasi tab", labels, horizontal=True, key=key, label_visibility="collapsed")
+        return [(selected, st.container())]
+    
+    def schedule_aggregates(self, tabs, labels, data, cells):
+        """Submit aggregate tab ke pool (urut layout), futures dikembalikan untuk dibaca.
+        
+        Render memanggil method yang sama dan menunggu hasil yang sedang
+        dihitung lewat result_cache, jadi tidak ada hitung ulang.
+        """
+        return [
+            aggregate_executor.submit(compute)
+            for label in labels
+            for compute in tabs[label][1](data, cells)
+        ]
+    
+    def log_aggregate_failure(self, future):
+        """Catat error aggregate yang tidak muncul di render (warming tab tersembunyi)"""
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Aggregate tab gagal dihitung", exc_info=future.exception())
+    
     def create_dashboard(self):
         """Membuat dashboard utama dengan tabs"""
         # Header
         st.markdown('<h1 class="main-header">📊 BRAZIL E-COMMERCE DASHBOARD</h1>', unsafe_allow_html=True)
         
         # Filter minimalis
-        filtered_data, selected_period = self.create_minimal_filters()
+        filtered_data, filtered_cells, selected_period = self.create_minimal_filters()
+        if filtered_cells.empty:
+            st.info("Tidak ada transaksi untuk filter ini")
+            return
         
         # Tabs utama
-        tab1, tab2, tab3, tab4 = st.tabs(["⭐ REVIEW ANALYSIS", "💰 REVENUE ANALYSIS", "📦 PRODUCT ANALYSIS", "👥 CUSTOMER ANALYSIS"])
-        
-        with tab1:
-            # Metrics expandable
-            self.display_minimal_review_metrics(filtered_data)
-            
-            # Layout utama
-            col1, col2 = st.columns([3, 2])
-            
-            with col1:
-                st.markdown("**🗺️ PETA REVIEW BRAZIL**")
-                fig, state_data = self.create_simple_map(filtered_data, 'review')
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                st.markdown("**🏆 RANKING STATE**")
-                self.display_state_ranking_vertical(filtered_data, 'review')
-        
-        with tab2:
-            # Metrics expandable
-            self.display_minimal_revenue_metrics(filtered_data)
-            
-            # Layout utama
-            col1, col2 = st.columns([3, 2])
-            
-            with col1:
-                st.markdown("**🗺️ PETA REVENUE BRAZIL**")
-                fig, state_data = self.create_simple_map(filtered_data, 'revenue')
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                st.markdown("**🏆 RANKING STATE**")
-                self.display_state_ranking_vertical(filtered_data, 'revenue')
-        
-        with tab3:
-            st.markdown("### 📦 PRODUCT PERFORMANCE ANALYSIS")
-            
-            # Tab untuk product analysis
-            subtab1, subtab2, subtab3 = st.tabs(["🏆 PRODUCT RANKINGS", "📈 REVIEW-REVENUE CORRELATION", "💡 INSIGHTS REVIEW-REVENUE"])
-            
-            with subtab1:
-                self.display_product_rankings(filtered_data)
-            
-            with subtab2:
-                self.create_review_revenue_correlation_analysis(filtered_data)
-            
-            with subtab3:
-                self.create_review_revenue_insights(filtered_data)
-        
-        with tab4:
-            # Metrics untuk customer spending
-            self.display_customer_spending_metrics(filtered_data)
-            
-            st.markdown("---")
-            
-            # Layout untuk customer analysis - BERDAMPINGAN
-            col_map, col_time = st.columns([2, 1])
-            
-            with col_map:
-                st.markdown("**🗺️ PETA SPENDING PER CUSTOMER - BRAZIL**")
-                fig, state_data = self.create_customer_spending_map(filtered_data)
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col_time:
-                # Tambahkan analisis revenue berdasarkan waktu di sini
-                self.create_time_period_revenue_analysis(filtered_data)
-            
-            # Spending segments dan repeat purchase analysis di bawah peta
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                self.display_spending_segments(filtered_data)
-            
-            with col2:
-                self.display_repeat_purchase_analysis(filtered_data)
+        tabs = self.register_tabs()
+        containers = self.tab_containers(list(tabs), 'active_tab')
+        rendered = [label for label, _ in containers]
+        
+        # Aggregate tab yang dirender dihitung paralel di pool, render mengambil hasilnya urut layout
+        futures = self.schedule_aggregates(tabs, rendered, filtered_data, filtered_cells)
+        for label, container in containers:
+            with container:
+                tabs[label][0](filtered_data, filtered_cells)
+        for future in futures:
+            self.log_aggregate_failure(future)
+        
+        # Tab tersembunyi baru di-warm setelah tab yang terlihat selesai, jadi tidak berebut worker
+        hidden = [label for label in tabs if label not in rendered]
+        for future in self.schedule_aggregates(tabs, hidden, filtered_data, filtered_cells):
+            future.add_done_callback(self.log_aggregate_failure)
 
 def main():
     # Initialize dan jalankan dashboard
-    dashboard = FinalCleanBrazilEcommerceDashboard("main_data.csv")
+    # DASHBOARD_INGEST=streaming: CSV dibaca per chunk, frame mentah tidak disimpan di memory
+    # DASHBOARD_DROP_DIR: folder CSV order baru yang di-append otomatis (mode streaming)
+    # DASHBOARD_AGGREGATION=parallel: groupby berat dipartisi ke process pool (semua core)
+    # DASHBOARD_SERVICE_URL: ambil aggregate dari service.py, dataset tidak di-load di sini
+    # DASHBOARD_INGEST=shared: dataset di-map dari file kolom bersama (DASHBOARD_SHARED_DIR, mis. /dev/shm)
+    # DASHBOARD_LAZY_TABS=1: navigasi tab lewat radio, hanya tab yang dipilih yang dirender
+    dashboard = FinalCleanBrazilEcommerceDashboard(
+        "main_data.csv",
+        lazy_tabs=os.environ.get('DASHBOARD_LAZY_TABS') == '1',
+        ingest=os.environ.get('DASHBOARD_INGEST', 'memory'),
+        drop_dir=os.environ.get('DASHBOARD_DROP_DIR'),
+        aggregation=os.environ.get('DASHBOARD_AGGREGATION', 'serial'),
+        service_url=os.environ.get('DASHBOARD_SERVICE_URL'),
+        shared_dir=os.environ.get('DASHBOARD_SHARED_DIR')
+    )
     dashboard.create_dashboard()
 
 if __name__ == "__main__":
@@ -0,0 +1,298 @@
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS hanya dari /proc (tidak tersedia)
+    resource = None
+
+import numpy as np
+import pandas as pd
+
+from aggregations import (
+    PartitionIndex, TimeIndex, build_category_facts, build_monthly_cube, correlation_categories,
+    customer_spending_summary, filter_cells, monthly_trend, repeat_purchase_stats, select_rows,
+    spending_distribution, spending_percentile_bands, spending_segment_stats, state_ranking_scores, state_review_revenue, state_spending,
+    time_bounds, time_period_revenue
+)
+from data_loader import ID_COLUMNS, dataset_key, read_dataset, read_raw, read_snapshot, write_snapshot
+from parallel import AGGREGATION_MODES, get_aggregator
+from shared_dataset import read_shared, shared_path, write_shared
+from sketches import SpendingSketches
+from streaming import ingest_csv
+
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_OUTPUT = os.path.join('benchmarks', 'baseline.json')
+
+
+def current_rss():
+    """RSS proses saat ini (bytes); di luar Linux pakai peak RSS dari getrusage"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRSSMonitor:
+    """Sampling RSS di background thread selama satu langkah benchmark"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def measure(results, name, func, repeat=1):
+    """Jalankan satu langkah, catat wall time terbaik dan peak RSS; kembalikan hasil terakhir"""
+    timings = []
+    peak = 0
+    for _ in range(repeat):
+        gc.collect()
+        with PeakRSSMonitor() as monitor:
+            start = time.perf_counter()
+            value = func()
+            timings.append(time.perf_counter() - start)
+        peak = max(peak, monitor.peak)
+    results[name] = {
+        'wall_s': round(min(timings), 6),
+        'peak_rss_mb': round(peak / 1024 ** 2, 1)
+    }
+    return value
+
+
+def scale_up(raw, factor):
+    """Replikasi data mentah factor kali dengan ID baru per salinan.
+
+    Order dan customer di setiap salinan berbeda, jadi distinct count dan
+    tabel fakta customer ikut membesar factor kali.
+    """
+    if factor == 1:
+        return raw.copy()
+
+    copies = []
+    for i in range(factor):
+        copy = raw.copy()
+        if i > 0:
+            for col in ID_COLUMNS:
+                copy[col] = copy[col] + f"-{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def write_scaled_csv(source, factor, workdir):
+    """Tulis CSV hasil scale-up ke workdir, dipakai ulang kalau sudah ada"""
+    path = os.path.join(workdir, f"{os.path.splitext(os.path.basename(source))[0]}_x{factor}.csv")
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+        scale_up(read_raw(source), factor).to_csv(path, index=False)
+    return path
+
+
+def representative_filter(df):
+    """Filter contoh: tahun dengan baris terbanyak dan dua periode hari pertama"""
+    year = df['tahun'].value_counts().idxmax()
+    periods = list(df['time_period'].cat.categories[:2])
+    return year, periods
+
+
+def run_scale(csv_path, repeat=1, aggregation='serial'):
+    """Benchmark semua komputasi dashboard untuk satu file (dijalankan di proses terpisah)"""
+    steps = {}
+    # Mode parallel: peak RSS hanya dari proses ini, worker pool tidak ikut terukur
+    aggregator = get_aggregator(aggregation)
+    if aggregation == 'parallel':
+        aggregator.warm_up()
+
+    # Ingest streaming diukur duluan: peak RSS-nya belum tercampur frame penuh
+    aggregates = measure(steps, 'load_streaming', lambda: ingest_csv(csv_path), repeat)
+
+    # Append harian ~1% baris dengan order dan customer baru (salinan kedua scale_up punya ID baru)
+    head = read_raw(csv_path, nrows=max(aggregates.n_rows // 100, 1))
+    delta = scale_up(head, 2).iloc[len(head):]
+    measure(steps, 'append_streaming', lambda: aggregates.append([delta.copy()]), repeat)
+    del aggregates, head, delta
+
+    df = measure(steps, 'load_csv', lambda: read_dataset(csv_path), repeat)
+
+    snapshot, source_key = os.path.splitext(csv_path)[0] + '.feather', dataset_key(csv_path)
+    measure(steps, 'write_snapshot', lambda: write_snapshot(df, snapshot, source_key), repeat)
+    measure(steps, 'load_snapshot', lambda: read_snapshot(snapshot, source_key), repeat)
+
+    # Mode shared: publish sekali, worker lain cukup map file (tanpa copy ke heap)
+    shared = shared_path(csv_path)
+    measure(steps, 'write_shared', lambda: write_shared(df, shared, source_key), repeat)
+    measure(steps, 'attach_shared', lambda: read_shared(shared, source_key), repeat)
+
+    cube = measure(steps, 'build_cube', lambda: aggregator.build_cube(df), repeat)
+    partitions = measure(steps, 'partition_index', lambda: PartitionIndex(df), repeat)
+
+    # Filter tahun + periode hari; aggregate di bawah memakai semua data (All Time, kasus terberat)
+    year, periods = representative_filter(df)
+    measure(steps, 'filter', lambda: (
+        select_rows(df, partitions.select(year, periods)),
+        filter_cells(cube, year, periods)
+    ), repeat)
+
+    # Filter bulan: binary search di frame terurut, slice tanpa copy, cell dibangun dari slice
+    time_index = measure(steps, 'time_index', lambda: TimeIndex(df['order_purchase_timestamp']), repeat)
+    month = time_index.months_in_year(year)[-1]
+    measure(steps, 'filter_month', lambda: aggregator.build_cube(select_rows(
+        df, partitions.select(year, [], time_index.slice(*time_bounds(year, month)))
+    )), repeat)
+    cells = filter_cells(cube, 'All Time', [])
+
+    measure(steps, 'state_map_review', lambda: state_review_revenue(cells, 'review'), repeat)
+    measure(steps, 'state_map_revenue', lambda: state_review_revenue(cells, 'revenue'), repeat)
+    measure(steps, 'state_ranking', lambda: state_ranking_scores(cells, 'review'), repeat)
+    measure(steps, 'customer_spending_map', lambda: state_spending(
+        cells, aggregator.distinct_count(df, 'customer_unique_id', by='nama_state')
+    ), repeat)
+    measure(steps, 'time_period_revenue', lambda: time_period_revenue(
+        cells,
+        aggregator.distinct_count(df, 'order_id', by='time_period'),
+        aggregator.distinct_count(df, 'customer_unique_id', by='time_period')
+    ), repeat)
+
+    customer_facts = measure(steps, 'customer_facts', lambda: aggregator.build_customer_facts(df), repeat)
+    measure(steps, 'customer_spending_metrics', lambda: customer_spending_summary(customer_facts), repeat)
+    measure(steps, 'spending_segments', lambda: spending_segment_stats(customer_facts), repeat)
+    measure(steps, 'repeat_purchase', lambda: repeat_purchase_stats(customer_facts), repeat)
+
+    # Percentile spending: sort sekali per filter (exact) atau merge sketch bucket (approximate)
+    distribution = measure(steps, 'spending_distribution', lambda: spending_distribution(customer_facts), repeat)
+    measure(steps, 'spending_percentiles', lambda: spending_percentile_bands(distribution), repeat)
+    spending_sketches = measure(steps, 'spending_sketches', lambda: SpendingSketches(df), repeat)
+    measure(steps, 'spending_percentiles_approx', lambda: spending_percentile_bands(
+        spending_sketches.distribution(spending_sketches.select('All Time', []))
+    ), repeat)
+
+    category_facts = measure(steps, 'category_facts', lambda: build_category_facts(
+        cells, aggregator.category_order_counts(df)
+    ), repeat)
+    measure(steps, 'correlation', lambda: correlation_categories(category_facts), repeat)
+
+    # Trend bulanan: aggregate bulanan sekali per dataset, trend per split dari cell-nya
+    monthly_cube = measure(steps, 'build_monthly_cube', lambda: build_monthly_cube(df), repeat)
+    monthly_cells = filter_cells(monthly_cube, 'All Time', [])
+    measure(steps, 'monthly_trend', lambda: monthly_trend(monthly_cells), repeat)
+    measure(steps, 'monthly_trend_category', lambda: monthly_trend(
+        monthly_cells, 'product_category_name_english'
+    ), repeat)
+
+    if aggregation == 'parallel':
+        # Pool harus ditutup eksplisit: proses benchmark ini sendiri worker dari ProcessPoolExecutor
+        aggregator.shutdown()
+    return {'rows': len(df), 'steps': steps}
+
+
+def run_benchmark(source, scales=DEFAULT_SCALES, repeat=1, workdir=None, aggregation='serial'):
+    """Benchmark setiap skala di proses baru supaya peak RSS tidak saling mempengaruhi"""
+    workdir = workdir or tempfile.mkdtemp(prefix='dashboard-bench-')
+    os.makedirs(workdir, exist_ok=True)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'source': os.path.basename(source),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'repeat': repeat,
+        'aggregation': aggregation,
+        'scales': {}
+    }
+    context = multiprocessing.get_context('spawn')
+    for factor in scales:
+        csv_path = write_scaled_csv(source, factor, workdir)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            report['scales'][str(factor)] = pool.submit(run_scale, csv_path, repeat, aggregation).result()
+    return report
+
+
+def compare_reports(baseline, current, tolerance=0.2):
+    """Langkah yang wall time atau peak RSS-nya naik lebih dari tolerance dibanding baseline"""
+    regressions = []
+    for scale, result in current['scales'].items():
+        base_steps = baseline.get('scales', {}).get(scale, {}).get('steps', {})
+        for name, metrics in result['steps'].items():
+            if name not in base_steps:
+                continue
+            for metric in ('wall_s', 'peak_rss_mb'):
+                before, after = base_steps[name][metric], metrics[metric]
+                if before > 0 and after > before * (1 + tolerance):
+                    regressions.append((scale, name, metric, before, after))
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark headless komputasi dashboard")
+    parser.add_argument('source', nargs='?', default="main_data.csv")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="Faktor scale-up data (default: 1 10 100)")
+    parser.add_argument('--repeat', type=int, default=1, help="Ulangi setiap langkah, ambil wall time terbaik")
+    parser.add_argument('--workdir', help="Folder untuk CSV hasil scale-up (default: folder temporary)")
+    parser.add_argument('--output', help=f"File JSON hasil benchmark (default: {DEFAULT_OUTPUT}, "
+                                         "tidak ditulis saat --compare)")
+    parser.add_argument('--compare', help="Baseline JSON; exit code 1 kalau ada regresi")
+    parser.add_argument('--aggregation', choices=AGGREGATION_MODES, default='serial',
+                        help="Backend groupby: serial atau parallel (process pool, semua core)")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Batas kenaikan relatif untuk --compare")
+    args = parser.parse_args()
+
+    # Baseline dibaca sebelum benchmark supaya tidak tertimpa hasil baru
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    output = args.output or (None if args.compare else DEFAULT_OUTPUT)
+
+    report = run_benchmark(args.source, args.scales, args.repeat, args.workdir, args.aggregation)
+
+    for scale, result in report['scales'].items():
+        print(f"x{scale} ({result['rows']:,} rows)")
+        for name, metrics in result['steps'].items():
+            print(f"  {name:<28} {metrics['wall_s']:>10.4f}s {metrics['peak_rss_mb']:>9.1f} MB")
+
+    if output:
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Hasil benchmark disimpan di {output}")
+
+    if baseline is not None:
+        regressions = compare_reports(baseline, report, args.tolerance)
+        for scale, name, metric, before, after in regressions:
+            print(f"REGRESI x{scale} {name} {metric}: {before} -> {after}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,385 @@
+import json
+import os
+import threading
+import timeit
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # snapshot dinonaktifkan tanpa pyarrow
+    pa = None
+    feather = None
+
+# Naikkan kalau hasil preprocess berubah supaya snapshot lama di-rebuild
+SNAPSHOT_VERSION = '4'
+
+# State mapping
+STATE_NAMES = {
+    'AC': 'Acre', 'AL': 'Alagoas', 'AP': 'Amapá', 'AM': 'Amazonas',
+    'BA': 'Bahia', 'CE': 'Ceará', 'DF': 'Distrito Federal',
+    'ES': 'Espírito Santo', 'GO': 'Goiás', 'MA': 'Maranhão',
+    'MT': 'Mato Grosso', 'MS': 'Mato Grosso do Sul', 'MG': 'Minas Gerais',
+    'PA': 'Pará', 'PB': 'Paraíba', 'PR': 'Paraná', 'PE': 'Pernambuco',
+    'PI': 'Piauí', 'RJ': 'Rio de Janeiro', 'RN': 'Rio Grande do Norte',
+    'RS': 'Rio Grande do Sul', 'RO': 'Rondônia', 'RR': 'Roraima',
+    'SC': 'Santa Catarina', 'SP': 'São Paulo', 'SE': 'Sergipe',
+    'TO': 'Tocantins'
+}
+
+
+# Schema kompak untuk frame utama
+CATEGORY_COLUMNS = ['customer_state', 'nama_state', 'time_period', 'product_category_name_english']
+ID_COLUMNS = ['order_id', 'customer_unique_id']
+TIME_FEATURE_COLUMNS = ['tahun', 'bulan', 'jam']
+READ_DTYPES = {
+    'customer_state': 'category',
+    'product_category_name_english': 'category'
+}
+
+
+# Periode waktu berdasarkan jam, urut dari pagi buta sampai malam
+TIME_PERIOD_LABELS = [
+    'Dini Hari (00:00-06:00)',
+    'Pagi (06:00-12:00)',
+    'Siang (12:00-18:00)',
+    'Malam (18:00-24:00)'
+]
+TIME_PERIOD_DTYPE = pd.CategoricalDtype(TIME_PERIOD_LABELS, ordered=True)
+TIME_PERIOD_EDGES = np.array([6, 12, 18])
+
+# Nama bulan untuk kolom bulan (1-12)
+MONTH_LABELS = [
+    'Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+    'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember'
+]
+
+
+def categorize_time_period(hour):
+    """Kategorikan waktu berdasarkan jam (per baris, dipakai sebagai referensi benchmark)"""
+    if 0 <= hour < 6:
+        return 'Dini Hari (00:00-06:00)'
+    elif 6 <= hour < 12:
+        return 'Pagi (06:00-12:00)'
+    elif 12 <= hour < 18:
+        return 'Siang (12:00-18:00)'
+    else:
+        return 'Malam (18:00-24:00)'
+
+
+def categorize_time_periods(hours):
+    """Versi vectorized categorize_time_period untuk satu kolom jam.
+
+    Hasilnya ordered categorical dengan label TIME_PERIOD_LABELS. Jam kosong
+    (timestamp NaT) tetap NaN, tidak ikut masuk ke 'Malam'.
+    """
+    hours = pd.Series(hours)
+    values = hours.to_numpy(dtype='float64', na_value=np.nan)
+    codes = np.searchsorted(TIME_PERIOD_EDGES, values, side='right')
+    codes[np.isnan(values)] = -1
+    return pd.Series(
+        pd.Categorical.from_codes(codes, dtype=TIME_PERIOD_DTYPE),
+        index=hours.index
+    )
+
+
+def benchmark_time_period(n_rows=1_000_000, repeat=3, seed=0):
+    """Micro-benchmark categorize_time_periods vs apply per baris (detik, best of repeat)"""
+    rng = np.random.default_rng(seed)
+    hours = pd.Series(rng.integers(0, 24, n_rows), dtype='float64')
+
+    expected = hours.apply(categorize_time_period)
+    result = categorize_time_periods(hours)
+    if not (result.astype(object) == expected).all():
+        raise AssertionError("Hasil vectorized berbeda dengan apply")
+
+    timings = {'rows': n_rows}
+    timings['apply'] = min(timeit.repeat(lambda: hours.apply(categorize_time_period), number=1, repeat=repeat))
+    timings['vectorized'] = min(timeit.repeat(lambda: categorize_time_periods(hours), number=1, repeat=repeat))
+    timings['speedup'] = timings['apply'] / timings['vectorized']
+    return timings
+
+
+def preprocess(df):
+    """Preprocess data mentah: timestamp, fitur waktu dan nama state"""
+    # Convert timestamp
+    df['order_purchase_timestamp'] = pd.to_datetime(
+        df['order_purchase_timestamp'], errors='coerce'
+    )
+
+    # Extract time features
+    df['tahun'] = df['order_purchase_timestamp'].dt.year
+    df['bulan'] = df['order_purchase_timestamp'].dt.month
+    df['jam'] = df['order_purchase_timestamp'].dt.hour
+
+    df['time_period'] = categorize_time_periods(df['jam'])
+    df['nama_state'] = df['customer_state'].map(STATE_NAMES)
+    return df
+
+
+def encode_ids(series):
+    """Ubah ID hex (object string) menjadi kode int64 yang deterministik.
+
+    Kode berasal dari hash isi string, jadi ID yang sama selalu mendapat kode
+    yang sama di proses mana pun tanpa perlu menyimpan vocabulary.
+    """
+    codes = pd.Series(
+        pd.util.hash_pandas_object(series, index=False).to_numpy().view('int64'),
+        index=series.index
+    )
+    if series.isna().any():
+        # nunique() tetap tidak menghitung ID kosong
+        codes = codes.astype('Int64').mask(series.isna())
+    return codes
+
+
+def mix64(values):
+    """Finalizer splitmix64 supaya bit hash tersebar merata"""
+    x = values.astype(np.uint64, copy=True)
+    with np.errstate(over='ignore'):
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return x
+
+
+def downcast_time_feature(series):
+    """Downcast tahun/bulan/jam: integer kecil, float32 kalau ada NaT"""
+    if series.isna().any():
+        return series.astype('float32')
+    return pd.to_numeric(series, downcast='integer')
+
+
+def apply_schema(df):
+    """Terapkan schema kompak: category, ID ter-encode, int8 dan downcast numerik"""
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            continue
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+        # Urutan categories = urutan alfabet, sama seperti groupby di kolom string
+        categories = df[col].cat.categories
+        if not df[col].cat.ordered and not categories.is_monotonic_increasing:
+            df[col] = df[col].cat.reorder_categories(categories.sort_values())
+
+    for col in ID_COLUMNS:
+        if col in df.columns and not pd.api.types.is_integer_dtype(df[col].dtype):
+            df[col] = encode_ids(df[col])
+
+    for col in TIME_FEATURE_COLUMNS:
+        df[col] = downcast_time_feature(df[col])
+
+    # review_score 0-5 muat di int8; float32 kalau ada review kosong
+    if df['review_score'].isna().any():
+        df['review_score'] = df['review_score'].astype('float32')
+    else:
+        df['review_score'] = df['review_score'].astype('int8')
+
+    # price tetap float64: total revenue di atas ~R$ 16 juta tidak presisi di float32
+    return df
+
+
+def memory_report(before, after):
+    """Pemakaian memory per kolom sebelum dan sesudah schema kompak (bytes)"""
+    report = pd.DataFrame({
+        'before': before.memory_usage(index=False, deep=True),
+        'after': after.memory_usage(index=False, deep=True)
+    }).fillna(0).astype('int64')
+    report.loc['TOTAL'] = report.sum()
+    report['ratio'] = (report['before'] / report['after']).round(2)
+    return report
+
+
+def read_raw(data_path, nrows=None):
+    """Baca CSV mentah dengan dtype schema (opsional hanya nrows baris pertama)"""
+    return pd.read_csv(data_path, dtype=READ_DTYPES, nrows=nrows)
+
+
+def sort_by_time(df):
+    """Urutkan baris per order_purchase_timestamp (stabil, NaT di akhir) untuk TimeIndex"""
+    return df.sort_values('order_purchase_timestamp', kind='stable', na_position='last', ignore_index=True)
+
+
+def read_dataset(data_path):
+    """Baca CSV dan preprocess, baris terurut per timestamp"""
+    return sort_by_time(apply_schema(preprocess(read_raw(data_path))))
+
+
+def snapshot_path(data_path):
+    """Lokasi snapshot Feather untuk sebuah CSV"""
+    return os.path.splitext(data_path)[0] + '.feather'
+
+
+def write_snapshot(df, path, source_key):
+    """Tulis frame hasil preprocess ke Feather secara atomic, dengan (mtime_ns, size) CSV sumbernya"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'snapshot_version'] = SNAPSHOT_VERSION.encode()
+    metadata[b'snapshot_source'] = json.dumps(list(source_key[1:])).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_snapshot(path, source_key):
+    """Baca snapshot Feather (memory-mapped), None kalau versi atau CSV sumbernya tidak cocok"""
+    table = feather.read_table(path, memory_map=True)
+    metadata = table.schema.metadata or {}
+    if metadata.get(b'snapshot_version') != SNAPSHOT_VERSION.encode():
+        return None
+    if metadata.get(b'snapshot_source') != json.dumps(list(source_key[1:])).encode():
+        return None
+    return table.to_pandas()
+
+
+def compile_snapshot(data_path, path=None):
+    """Preprocess CSV sekali dan simpan hasilnya sebagai snapshot"""
+    path = path or snapshot_path(data_path)
+    # Stat diambil sebelum baca, jadi CSV yang berubah saat dibaca membuat snapshot langsung basi
+    key = dataset_key(data_path)
+    df = read_dataset(data_path)
+    write_snapshot(df, path, key)
+    return df
+
+
+def load_dataset(data_path):
+    """Load dataset dari snapshot kalau dibuat dari versi CSV yang sama, selain itu rebuild dari CSV"""
+    if feather is None:
+        return read_dataset(data_path)
+
+    key = dataset_key(data_path)
+    path = snapshot_path(data_path)
+    if os.path.exists(path):
+        try:
+            df = read_snapshot(path, key)
+            if df is not None:
+                return df
+        except (OSError, pa.ArrowException):
+            pass  # snapshot rusak, rebuild di bawah
+
+    df = read_dataset(data_path)
+    try:
+        write_snapshot(df, path, key)
+    except (OSError, pa.ArrowException):
+        pass  # folder read-only, tetap jalan tanpa snapshot
+    return df
+
+
+def dataset_key(data_path):
+    """Key cache dataset: (path absolut, mtime, size) dari file"""
+    stat = os.stat(data_path)
+    return (os.path.abspath(data_path), stat.st_mtime_ns, stat.st_size)
+
+
+class DatasetCache:
+    """Cache dataset yang dipakai bersama oleh semua session dalam satu proses.
+
+    Entry di-key dengan path + mtime + size, jadi otomatis invalid kalau file
+    berubah. Load dilakukan sekali per key walaupun banyak session meminta
+    bersamaan (session lain menunggu hasil load yang sama).
+    """
+
+    def __init__(self, loader=load_dataset):
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._path_locks = {}
+
+    def _path_lock(self, path):
+        with self._lock:
+            return self._path_locks.setdefault(path, threading.Lock())
+
+    def get(self, data_path):
+        """Ambil dataset dari cache, load ulang kalau file berubah"""
+        key = dataset_key(data_path)
+        path = key[0]
+
+        with self._path_lock(path):
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                with self._lock:
+                    self.hits += 1
+                return entry[1], key
+
+            with self._lock:
+                self.misses += 1
+            # Loader boleh mengembalikan (df, struktur turunan) kalau turunannya ikut di-load
+            loaded = self.loader(data_path)
+            df, derived = loaded if isinstance(loaded, tuple) else (loaded, {})
+            # Simpan hanya versi terbaru per path, beserta struktur turunannya
+            self._entries[path] = (key, df, derived)
+            return df, key
+
+    def derived(self, key, name, build):
+        """Struktur turunan dataset (cube, index, dll) yang dibangun sekali per versi.
+
+        Ikut terhapus saat dataset di-load ulang. Kalau versi dataset sudah
+        tidak ada di cache, hasil build tetap dikembalikan tanpa disimpan.
+        """
+        path = key[0]
+        with self._path_lock(path):
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != key:
+                return build()
+            if name not in entry[2]:
+                entry[2][name] = build()
+            return entry[2][name]
+
+    def invalidate(self, data_path=None):
+        """Hapus entry cache (satu path atau semua)"""
+        with self._lock:
+            if data_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(data_path), None)
+
+    def stats(self):
+        """Statistik hit/miss cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total > 0 else 0.0,
+                'entries': len(self._entries)
+            }
+
+
+# Cache process-wide, modul ini tidak di-execute ulang saat Streamlit rerun
+dataset_cache = DatasetCache()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile snapshot dataset dashboard")
+    parser.add_argument('source', nargs='?', default="main_data.csv")
+    parser.add_argument('--bench-time-period', action='store_true',
+                        help="Jalankan micro-benchmark time_period (vectorized vs apply)")
+    args = parser.parse_args()
+
+    if args.bench_time_period:
+        timings = benchmark_time_period()
+        print(f"time_period {timings['rows']:,} rows: apply {timings['apply']:.3f}s, "
+              f"vectorized {timings['vectorized']:.4f}s ({timings['speedup']:.0f}x)")
+    else:
+        # Compile snapshot: python data_loader.py [main_data.csv]
+        compiled = compile_snapshot(args.source)
+        print(f"Snapshot {snapshot_path(args.source)} dibuat ({len(compiled):,} records)")
+
+        # Laporan memory per kolom: default dtype vs schema kompak
+        baseline = preprocess(pd.read_csv(args.source))
+        baseline['time_period'] = baseline['time_period'].astype(object)
+        print(memory_report(baseline, compiled).to_string())
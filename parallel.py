@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregations import (
+    CUBE_MEASURES, build_cube, build_customer_facts, combine_partials, cube_keys, distinct_count
+)
+
+# Di bawah jumlah baris ini overhead kirim data ke worker lebih mahal dari groupby-nya
+DEFAULT_MIN_ROWS = 1_000_000
+
+AGGREGATION_MODES = ('serial', 'parallel')
+
+
+def hash_partitions(frame, columns, n_partitions):
+    """Posisi baris per partisi hash dari columns, urutan baris asli tetap terjaga.
+
+    Semua baris dengan nilai columns yang sama selalu masuk partisi yang sama,
+    jadi aggregate per nilai itu bisa dihitung lengkap di satu partisi.
+    """
+    hashes = pd.util.hash_pandas_object(frame[columns], index=False).to_numpy()
+    partition = (hashes % np.uint64(n_partitions)).astype(np.int64)
+    order = np.argsort(partition, kind='stable')
+    bounds = np.searchsorted(partition[order], np.arange(n_partitions + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_partitions)]
+
+
+def merge_distinct_counts(partials, by=None):
+    """Gabungkan distinct count dari partisi yang nilainya saling disjoint"""
+    if by is None:
+        return sum(partials)
+    return pd.concat(partials).groupby(level=0, observed=True).sum()
+
+
+class SerialAggregator:
+    """Backend aggregate default: groupby pandas di thread pemanggil"""
+
+    mode = 'serial'
+
+    def build_cube(self, df):
+        return build_cube(df)
+
+    def build_customer_facts(self, data):
+        return build_customer_facts(data)
+
+    def distinct_count(self, data, column, by=None):
+        return distinct_count(data, column, by)
+
+    def category_order_counts(self, data):
+        return self.distinct_count(data, 'order_id', by='product_category_name_english')
+
+
+class ParallelAggregator(SerialAggregator):
+    """Backend aggregate multi-core: partial aggregate per partisi hash di process pool.
+
+    Partisi dipilih supaya setiap grup aggregate berada utuh di satu partisi
+    (hash customer_unique_id untuk fakta customer, hash kolom yang dihitung
+    untuk distinct count, hash key cell untuk cube). Urutan baris dalam
+    partisi sama dengan frame asli, jadi hasil merge identik dengan path
+    serial, termasuk jumlah float dan nama_state 'first'.
+    """
+
+    mode = 'parallel'
+
+    def __init__(self, workers=None, min_rows=DEFAULT_MIN_ROWS):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Dibuat saat pertama dipakai; spawn supaya aman dari thread Streamlit
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def warm_up(self):
+        """Start semua worker sekarang supaya biaya spawn tidak masuk ke aggregate pertama"""
+        list(self.pool.map(abs, range(self.workers)))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _map_partitions(self, func, frame, partition_columns, *args):
+        """Jalankan func di setiap partisi hash yang tidak kosong, kembalikan hasil per partisi"""
+        partitions = hash_partitions(frame, partition_columns, self.workers)
+        futures = [
+            self.pool.submit(func, frame.take(positions), *args)
+            for positions in partitions if len(positions)
+        ]
+        return [future.result() for future in futures]
+
+    def _serial(self, data):
+        return self.workers == 1 or len(data) < self.min_rows
+
+    def build_cube(self, df):
+        if self._serial(df):
+            return super().build_cube(df)
+        keys = cube_keys(df)
+        columns = keys + ['price', 'review_score']
+        partials = self._map_partitions(build_cube, df[columns], keys)
+        return combine_partials(partials, keys, {col: 'sum' for col in CUBE_MEASURES})
+
+    def build_customer_facts(self, data):
+        if self._serial(data):
+            return super().build_customer_facts(data)
+        columns = ['customer_unique_id', 'price', 'order_id', 'nama_state']
+        partials = self._map_partitions(build_customer_facts, data[columns], ['customer_unique_id'])
+        facts = pd.concat(partials, ignore_index=True)
+        return facts.sort_values('customer_unique_id', kind='stable').reset_index(drop=True)
+
+    def distinct_count(self, data, column, by=None):
+        if self._serial(data):
+            return super().distinct_count(data, column, by)
+        columns = [column] if by is None else [column, by]
+        partials = self._map_partitions(distinct_count, data[columns], [column], column, by)
+        return merge_distinct_counts(partials, by)
+
+
+_aggregators = {}
+_aggregators_lock = threading.Lock()
+
+
+def get_aggregator(mode='serial', workers=None):
+    """Backend aggregate process-wide per mode ('serial' atau 'parallel')"""
+    if mode not in AGGREGATION_MODES:
+        raise ValueError(f"Mode aggregate tidak dikenal: {mode} (pilih {', '.join(AGGREGATION_MODES)})")
+    with _aggregators_lock:
+        if mode not in _aggregators:
+            _aggregators[mode] = ParallelAggregator(workers) if mode == 'parallel' else SerialAggregator()
+        return _aggregators[mode]
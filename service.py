@@ -0,0 +1,491 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from aggregations import (
+    TREND_SPLITS, TREND_WINDOWS, PartitionIndex, build_category_facts, build_monthly_cube, correlation_categories,
+    customer_spending_summary, filter_cells, monthly_trend, repeat_purchase_stats, result_cache, select_rows,
+    spending_distribution, spending_percentile_bands, spending_segment_stats, state_ranking_scores,
+    state_review_revenue, state_spending, time_period_revenue
+)
+from data_loader import dataset_cache
+from parallel import get_aggregator
+from shared_dataset import get_shared_cache
+from streaming import streaming_cache, watch_drop_directory
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+API_PREFIX = '/v1/'
+
+# Koneksi keep-alive per client; cukup untuk semua thread aggregate dashboard
+DEFAULT_POOL_SIZE = 16
+DEFAULT_TIMEOUT = 300
+
+ALL_TIME = 'All Time'
+SCORE_TYPES = ('review', 'revenue')
+DISTINCT_COLUMNS = ('order_id', 'customer_unique_id')
+DISTINCT_DIMENSIONS = ('nama_state', 'time_period', 'product_category_name_english')
+
+
+class ServiceError(RuntimeError):
+    """Error dari service aggregate (status HTTP bukan 200)"""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def encode_frame(frame):
+    """DataFrame -> dict JSON, dtype (termasuk urutan kategori) ikut disimpan"""
+    columns = []
+    for name, dtype in frame.dtypes.items():
+        column = {'name': name, 'dtype': str(dtype)}
+        if isinstance(dtype, pd.CategoricalDtype):
+            column['categories'] = dtype.categories.tolist()
+            column['ordered'] = bool(dtype.ordered)
+        columns.append(column)
+    values = frame.astype(object).where(frame.notna(), None)
+    # Timestamp dikirim sebagai string ISO, astype ke dtype datetime aslinya saat decode
+    for name in frame.select_dtypes('datetime').columns:
+        values[name] = frame[name].astype(str).where(frame[name].notna(), None)
+    payload = {'type': 'frame', 'columns': columns, 'data': values.to_numpy().tolist()}
+    # Index integer hasil sort_values ikut dikirim, index default cukup direkonstruksi
+    if not frame.index.equals(pd.RangeIndex(len(frame))):
+        payload['index'] = {'dtype': str(frame.index.dtype), 'values': frame.index.tolist()}
+    return payload
+
+
+def decode_frame(payload):
+    """Kebalikan encode_frame: frame dengan dtype yang sama persis"""
+    names = [column['name'] for column in payload['columns']]
+    frame = pd.DataFrame(payload['data'], columns=names)
+    if 'index' in payload:
+        frame.index = pd.Index(payload['index']['values'], dtype=payload['index']['dtype'])
+    for column in payload['columns']:
+        if 'categories' in column:
+            dtype = pd.CategoricalDtype(column['categories'], ordered=column['ordered'])
+        else:
+            dtype = column['dtype']
+        frame[column['name']] = frame[column['name']].astype(dtype)
+    return frame
+
+
+def encode_result(result):
+    """Hasil aggregate (frame, series, dict, tuple, scalar numpy) -> struktur JSON"""
+    if isinstance(result, pd.DataFrame):
+        return encode_frame(result)
+    if isinstance(result, pd.Series):
+        return {'type': 'series', 'name': result.name, 'frame': encode_frame(result.reset_index())}
+    if isinstance(result, dict):
+        return {'type': 'dict', 'items': {key: encode_result(value) for key, value in result.items()}}
+    if isinstance(result, (tuple, list)):
+        return {'type': 'tuple', 'items': [encode_result(item) for item in result]}
+    if isinstance(result, np.generic):
+        return result.item()
+    return result
+
+
+def decode_result(payload):
+    """Kebalikan encode_result"""
+    if not isinstance(payload, dict):
+        return payload
+    if payload['type'] == 'frame':
+        return decode_frame(payload)
+    if payload['type'] == 'series':
+        frame = decode_frame(payload['frame'])
+        series = frame.set_index(frame.columns[0])[frame.columns[1]]
+        series.name = payload['name']
+        return series
+    if payload['type'] == 'dict':
+        return {key: decode_result(value) for key, value in payload['items'].items()}
+    return tuple(decode_result(item) for item in payload['items'])
+
+
+def parse_year(value):
+    """'All Time' atau tahun (kolom tahun float32, '2017' dan '2017.0' sama)"""
+    if value is None or value == ALL_TIME:
+        return ALL_TIME
+    return float(value)
+
+
+def choice(params, name, options, default=None):
+    value = params.get(name, default)
+    if value not in options:
+        raise ValueError(f"Parameter {name} harus salah satu dari: {', '.join(map(str, options))}")
+    return value
+
+
+class DatasetView:
+    """Satu versi dataset di service: cube plus sumber distinct count dan fakta customer"""
+
+    def __init__(self, data_path, ingest='memory', aggregator=None, cache=dataset_cache):
+        self.aggregator = aggregator or get_aggregator()
+        self.cache = cache
+        if ingest == 'streaming':
+            builder, file_key = streaming_cache.get(data_path)
+            self.aggregates = builder.snapshot
+            self.key = file_key + (self.aggregates.version,)
+            self.df = None
+            self.cube = self.aggregates.cube
+            self.n_rows = self.aggregates.n_rows
+        else:
+            self.aggregates = None
+            self.df, self.key = cache.get(data_path)
+            self.cube = cache.derived(self.key, 'cube', lambda: self.aggregator.build_cube(self.df))
+            self.partitions = cache.derived(self.key, 'partitions', lambda: PartitionIndex(self.df))
+            self.n_rows = len(self.df)
+
+    @property
+    def monthly_cube(self):
+        # Aggregate bulanan baru dibangun saat query trend pertama per versi dataset
+        if self.df is None:
+            return self.aggregates.monthly_cube
+        return self.cache.derived(self.key, 'monthly_cube', lambda: build_monthly_cube(self.df))
+
+    def options(self):
+        """Opsi filter yang valid untuk dataset ini"""
+        return {
+            'years': [year.item() for year in sorted(self.cube['tahun'].dropna().unique())],
+            'time_periods': sorted(self.cube['time_period'].dropna().unique())
+        }
+
+
+class FilteredQueries:
+    """Aggregate headless untuk satu (versi dataset, filter), hasil disimpan di result_cache"""
+
+    def __init__(self, view, selected_year, selected_time_period):
+        self.view = view
+        self.selected_filter = (selected_year, selected_time_period)
+        self.filter_key = ('service', view.key, selected_year, frozenset(selected_time_period))
+        self.cells = filter_cells(view.cube, selected_year, selected_time_period)
+        self._data = None
+
+    def memoize(self, method, compute, *args):
+        return result_cache.get_or_compute((self.filter_key, method) + args, compute)
+
+    @property
+    def data(self):
+        # Frame terfilter hanya dibutuhkan query berbasis baris (mode memory)
+        if self._data is None:
+            positions = self.view.partitions.select(*self.selected_filter)
+            self._data = select_rows(self.view.df, positions)
+        return self._data
+
+    def distinct_count(self, column, by=None):
+        def compute():
+            if self.view.df is None:
+                return self.view.aggregates.distinct_count(column, *self.selected_filter, by=by)
+            return self.view.aggregator.distinct_count(self.data, column, by)
+
+        return self.memoize('distinct_count', compute, column, by)
+
+    def customer_facts(self):
+        def compute():
+            if self.view.df is None:
+                return self.view.aggregates.customer_facts(*self.selected_filter)
+            return self.view.aggregator.build_customer_facts(self.data)
+
+        return self.memoize('customer_facts', compute)
+
+    def spending_distribution(self):
+        return self.memoize('spending_distribution', lambda: spending_distribution(self.customer_facts()))
+
+    def category_order_counts(self):
+        def compute():
+            if self.view.df is None:
+                return self.view.aggregates.category_order_counts(*self.selected_filter)
+            return self.view.aggregator.category_order_counts(self.data)
+
+        return self.memoize('category_order_counts', compute)
+
+    def category_facts(self):
+        return self.memoize('category_facts', lambda: build_category_facts(self.cells, self.category_order_counts()))
+
+    def run(self, name, params):
+        """Jalankan query terdaftar dengan parameter tambahan dari query string"""
+        return QUERIES[name](self, params)
+
+
+def _state_map(queries, params):
+    score_type = choice(params, 'score_type', SCORE_TYPES, 'review')
+    return queries.memoize('state_map', lambda: state_review_revenue(queries.cells, score_type), score_type)
+
+
+def _state_ranking(queries, params):
+    score_type = choice(params, 'score_type', SCORE_TYPES, 'review')
+    return queries.memoize('state_ranking', lambda: state_ranking_scores(queries.cells, score_type), score_type)
+
+
+def _distinct_count(queries, params):
+    column = choice(params, 'column', DISTINCT_COLUMNS)
+    by = params.get('by')
+    if by is not None:
+        by = choice(params, 'by', DISTINCT_DIMENSIONS)
+    return queries.distinct_count(column, by)
+
+
+def _correlation(queries, params):
+    return queries.memoize('correlation', lambda: correlation_categories(queries.category_facts()))
+
+
+def _customer_spending_map(queries, params):
+    def compute():
+        return state_spending(queries.cells, queries.distinct_count('customer_unique_id', 'nama_state'))
+
+    return queries.memoize('customer_spending_map', compute)
+
+
+def _time_period(queries, params):
+    def compute():
+        return time_period_revenue(
+            queries.cells,
+            queries.distinct_count('order_id', 'time_period'),
+            queries.distinct_count('customer_unique_id', 'time_period')
+        )
+
+    return queries.memoize('time_period', compute)
+
+
+def _monthly_trend(queries, params):
+    # Tanpa parameter split berarti total keseluruhan
+    split = params.get('split')
+    if split is not None:
+        split = choice(params, 'split', TREND_SPLITS)
+    window = int(params.get('window', 3))
+    if window not in TREND_WINDOWS:
+        raise ValueError(f"Parameter window harus salah satu dari: {', '.join(map(str, TREND_WINDOWS))}")
+
+    def compute():
+        cells = filter_cells(queries.view.monthly_cube, *queries.selected_filter)
+        return monthly_trend(cells, split, window)
+
+    return queries.memoize('monthly_trend', compute, split, window)
+
+
+def _spending_percentiles(queries, params):
+    return queries.memoize('spending_percentiles', lambda: spending_percentile_bands(queries.spending_distribution()))
+
+
+def _customer_stats(summarize):
+    def query(queries, params):
+        return queries.memoize(summarize.__name__, lambda: summarize(queries.customer_facts()))
+    return query
+
+
+def _spending_stats(summarize):
+    # Median dan statistik segment dari distribusi terurut yang dipakai bersama per filter
+    def query(queries, params):
+        return queries.memoize(
+            summarize.__name__, lambda: summarize(queries.customer_facts(), queries.spending_distribution())
+        )
+    return query
+
+
+# Endpoint tanpa filter: info versi dataset dan cube lengkap (untuk filter di sisi client)
+DATASET_ENDPOINTS = ('dataset', 'cube')
+
+# Endpoint /v1/<nama>: semua menerima filter year dan period (boleh berulang)
+QUERIES = {
+    'cells': lambda queries, params: queries.cells,
+    'state_map': _state_map,
+    'state_ranking': _state_ranking,
+    'distinct_count': _distinct_count,
+    'category_order_counts': lambda queries, params: queries.category_order_counts(),
+    'category_facts': lambda queries, params: queries.category_facts(),
+    'correlation': _correlation,
+    'customer_spending': _spending_stats(customer_spending_summary),
+    'customer_spending_map': _customer_spending_map,
+    'time_period': _time_period,
+    'spending_segments': _spending_stats(spending_segment_stats),
+    'spending_percentiles': _spending_percentiles,
+    'repeat_purchase': _customer_stats(repeat_purchase_stats),
+    'monthly_trend': _monthly_trend
+}
+
+
+class AggregationService:
+    """Dataset dan cache hasil yang dipakai bersama semua request ke service"""
+
+    def __init__(self, data_path, ingest='memory', aggregation='serial', drop_dir=None, shared_dir=None):
+        self.data_path = data_path
+        self.ingest = ingest
+        self.drop_dir = drop_dir
+        self.aggregator = get_aggregator(aggregation)
+        # Beberapa replika service bisa map file kolom yang sama (ingest='shared')
+        self.cache = get_shared_cache(shared_dir) if ingest == 'shared' else dataset_cache
+
+    def view(self):
+        """Versi dataset terbaru; satu view per request supaya hasilnya konsisten"""
+        if self.ingest == 'streaming' and self.drop_dir:
+            watch_drop_directory(self.data_path, self.drop_dir)
+        return DatasetView(self.data_path, self.ingest, self.aggregator, self.cache)
+
+    def handle(self, name, query):
+        """Hasil endpoint sebagai struktur JSON"""
+        view = self.view()
+        if name == 'dataset':
+            return {'key': list(view.key), 'rows': view.n_rows, 'ingest': self.ingest, **view.options()}
+        if name == 'cube':
+            return encode_result(view.cube)
+
+        params = {key: values[-1] for key, values in query.items()}
+        selected_year = parse_year(params.pop('year', None))
+        # Tanpa parameter period berarti semua periode; 'period=' (kosong) berarti tidak ada periode
+        if params.pop('period', None) is not None:
+            periods = [period for period in query['period'] if period]
+        else:
+            periods = view.options()['time_periods']
+
+        queries = FilteredQueries(view, selected_year, periods)
+        return encode_result(queries.run(name, params))
+
+
+class AggregationRequestHandler(BaseHTTPRequestHandler):
+    """GET /v1/<endpoint>?year=..&period=..: hasil aggregate sebagai JSON"""
+
+    # HTTP/1.1 supaya koneksi client tetap terbuka (keep-alive) antar request
+    protocol_version = 'HTTP/1.1'
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if not url.path.startswith(API_PREFIX):
+            return self.send_json(404, {'error': f"Path tidak dikenal: {url.path}"})
+
+        name = url.path[len(API_PREFIX):]
+        if name not in DATASET_ENDPOINTS and name not in QUERIES:
+            return self.send_json(404, {'error': f"Endpoint tidak dikenal: {name}"})
+        try:
+            body = self.service.handle(name, parse_qs(url.query, keep_blank_values=True))
+        except ValueError as e:
+            return self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            return self.send_json(500, {'error': f"{type(e).__name__}: {e}"})
+        self.send_json(200, body)
+
+    def send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """HTTP server (satu thread per koneksi) untuk service aggregate"""
+    handler = type('Handler', (AggregationRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class RemoteAggregates:
+    """Satu versi dataset di service, dengan interface yang sama seperti snapshot streaming.
+
+    Cube diambil sekali per versi dataset; distinct count, order per kategori
+    dan statistik customer dihitung di service.
+    """
+
+    def __init__(self, client, info, cube):
+        self.client = client
+        self.key = ('service', client.base_url) + tuple(info['key'])
+        self.n_rows = info['rows']
+        self.cube = cube
+
+    def query(self, name, selected_year, selected_time_period, **params):
+        return self.client.query(name, selected_year, selected_time_period, **params)
+
+    def distinct_count(self, column, selected_year, selected_time_period, by=None):
+        params = {'column': column} if by is None else {'column': column, 'by': by}
+        return self.query('distinct_count', selected_year, selected_time_period, **params)
+
+    def category_order_counts(self, selected_year, selected_time_period):
+        return self.query('category_order_counts', selected_year, selected_time_period)
+
+
+class AggregationClient:
+    """Client service aggregate dengan pool koneksi keep-alive (thread-safe untuk GET)"""
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self._cubes = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, params=None):
+        """GET satu endpoint, kembalikan body JSON"""
+        response = self.session.get(f"{self.base_url}{API_PREFIX}{name}", params=params, timeout=self.timeout)
+        if response.status_code != 200:
+            raise ServiceError(response.status_code, response.json().get('error', response.text))
+        return response.json()
+
+    def query(self, name, selected_year='All Time', selected_time_period=None, **params):
+        """Hasil aggregate untuk filter (year, list periode), sudah di-decode ke pandas"""
+        params['year'] = str(selected_year)
+        if selected_time_period is not None:
+            params['period'] = list(selected_time_period) or ['']
+        return decode_result(self.get(name, params))
+
+    def snapshot(self):
+        """Versi dataset terbaru di service; cube di-download hanya kalau versinya berubah"""
+        info = self.get('dataset')
+        key = tuple(info['key'])
+        with self._lock:
+            cube = self._cubes.get(key)
+        if cube is None:
+            cube = decode_result(self.get('cube'))
+            with self._lock:
+                # Simpan hanya versi terbaru
+                self._cubes = {key: cube}
+        return RemoteAggregates(self, info, cube)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url):
+    """Client process-wide per URL, jadi pool koneksi dipakai bersama semua session"""
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = AggregationClient(base_url)
+        return _clients[base_url]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Service aggregate dashboard (HTTP/JSON)")
+    parser.add_argument('data_path', nargs='?', default="main_data.csv")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--ingest', choices=('memory', 'streaming', 'shared'), default='memory')
+    parser.add_argument('--aggregation', choices=('serial', 'parallel'), default='serial')
+    parser.add_argument('--drop-dir', help="Folder CSV order baru (mode streaming)")
+    parser.add_argument('--shared-dir', help="Folder file kolom shared, mis. /dev/shm (mode shared)")
+    args = parser.parse_args()
+
+    service = AggregationService(args.data_path, args.ingest, args.aggregation, args.drop_dir, args.shared_dir)
+    # Load dataset sekarang supaya request pertama tidak menunggu
+    service.view()
+    server = create_server(service, args.host, args.port)
+    print(f"Service aggregate di http://{args.host}:{server.server_port}{API_PREFIX}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
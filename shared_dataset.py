@@ -0,0 +1,208 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregations import PartitionIndex
+from data_loader import SNAPSHOT_VERSION, DatasetCache, dataset_key, load_dataset
+
+# Naikkan kalau layout file berubah; versi snapshot ikut supaya hasil preprocess baru ikut di-publish ulang
+SHARED_VERSION = f"1.{SNAPSHOT_VERSION}"
+MAGIC = b'DASHCOLS'
+ALIGNMENT = 64
+
+
+def shared_path(data_path, directory=None):
+    """Lokasi file kolom shared: di samping CSV, atau di directory (mis. /dev/shm)"""
+    if directory is None:
+        return os.path.splitext(data_path)[0] + '.columns'
+    # Nama file unik per path CSV supaya dataset berbeda tidak saling menimpa di /dev/shm
+    digest = hashlib.sha1(os.path.abspath(data_path).encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(data_path))[0]
+    return os.path.join(directory, f"{name}-{digest}.columns")
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def column_arrays(series):
+    """Metadata dan array numpy untuk satu kolom.
+
+    Kategori disimpan sebagai kode + daftar kategori, Int64 nullable sebagai
+    nilai + mask, kolom numpy (numerik, datetime) apa adanya. Kolom teks
+    lain (object atau str, mis. order_status) disimpan sebagai kategori.
+    """
+    dtype = series.dtype
+    if not isinstance(dtype, pd.CategoricalDtype) and (dtype == object or pd.api.types.is_string_dtype(dtype)):
+        series = series.astype('category')
+        dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        meta = {
+            'kind': 'category',
+            'categories': dtype.categories.tolist(),
+            'categories_dtype': str(dtype.categories.dtype),
+            'ordered': bool(dtype.ordered)
+        }
+        return meta, {'codes': series.cat.codes.to_numpy()}
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        if not pd.api.types.is_integer_dtype(dtype):
+            raise TypeError(f"Kolom {series.name} ({dtype}) tidak didukung file shared")
+        values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        return {'kind': 'masked'}, {'values': values, 'mask': series.isna().to_numpy()}
+    return {'kind': 'array'}, {'values': series.to_numpy()}
+
+
+def build_column(meta, arrays):
+    """Kebalikan column_arrays, tanpa copy dari array yang di-map"""
+    if meta['kind'] == 'category':
+        categories = pd.Index(meta['categories'], dtype=meta['categories_dtype'])
+        dtype = pd.CategoricalDtype(categories, ordered=meta['ordered'])
+        return pd.Categorical.from_codes(arrays['codes'], dtype=dtype)
+    if meta['kind'] == 'masked':
+        return pd.arrays.IntegerArray(arrays['values'], arrays['mask'])
+    return arrays['values']
+
+
+def write_shared(df, path, source_key, partitions=None):
+    """Tulis kolom frame (dan index partisi) ke satu file biner secara atomic.
+
+    Layout: MAGIC, panjang header (8 byte), header JSON, lalu setiap array
+    rata ALIGNMENT byte supaya bisa di-view langsung dari memory map.
+    """
+    partitions = partitions or PartitionIndex(df)
+    blocks = []
+    offset = 0
+
+    def add(array):
+        nonlocal offset
+        array = np.ascontiguousarray(array)
+        offset = _aligned(offset)
+        blocks.append((offset, array))
+        entry = {'offset': offset, 'dtype': array.dtype.str, 'length': len(array)}
+        offset += array.nbytes
+        return entry
+
+    columns = []
+    for name in df.columns:
+        meta, arrays = column_arrays(df[name])
+        columns.append({'name': name, **meta, 'arrays': {key: add(array) for key, array in arrays.items()}})
+
+    header = {
+        'version': SHARED_VERSION,
+        'source': list(source_key[1:]),
+        'rows': len(df),
+        'columns': columns,
+        'partitions': {
+            'year': [[_scalar(key), add(positions)] for key, positions in partitions.year_positions.items()],
+            'time_period': [[_scalar(key), add(positions)] for key, positions in partitions.period_positions.items()]
+        }
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header_bytes).to_bytes(8, 'little'))
+            f.write(header_bytes)
+            for block_offset, array in blocks:
+                f.seek(data_start + block_offset)
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def read_shared(path, source_key):
+    """Map file shared read-only: (frame, {'partitions': index}), None kalau versi/sumbernya beda.
+
+    Semua kolom dan array posisi adalah view ke memory map, jadi halaman
+    datanya dipakai bersama (page cache) oleh semua proses yang membuka file
+    yang sama. Frame read-only: jangan dimodifikasi.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        header_size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_size))
+    if header['version'] != SHARED_VERSION or header['source'] != list(source_key[1:]):
+        return None
+
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    data_start = _aligned(len(MAGIC) + 8 + header_size)
+
+    def view(entry):
+        dtype = np.dtype(entry['dtype'])
+        start = data_start + entry['offset']
+        return mapped[start:start + entry['length'] * dtype.itemsize].view(dtype)
+
+    df = pd.DataFrame({
+        column['name']: build_column(column, {key: view(entry) for key, entry in column['arrays'].items()})
+        for column in header['columns']
+    }, copy=False)
+
+    partitions = PartitionIndex.from_positions(
+        header['rows'],
+        {key: view(entry) for key, entry in header['partitions']['year']},
+        {key: view(entry) for key, entry in header['partitions']['time_period']}
+    )
+    return df, {'partitions': partitions}
+
+
+def load_shared_dataset(data_path, directory=None):
+    """Dataset dari file shared; file di-publish sekali oleh proses pertama yang membutuhkannya"""
+    key = dataset_key(data_path)
+    path = shared_path(data_path, directory)
+    if os.path.exists(path):
+        try:
+            loaded = read_shared(path, key)
+            if loaded is not None:
+                return loaded
+        except (OSError, ValueError, KeyError):
+            pass  # file rusak atau setengah jadi, publish ulang di bawah
+
+    df = load_dataset(data_path)
+    try:
+        write_shared(df, path, key)
+    except (OSError, TypeError, ValueError):
+        # Folder read-only atau kolom yang tidak bisa ditulis: tetap jalan dengan frame private
+        return df, {}
+    # Frame private dilepas, proses ini juga memakai halaman yang di-map
+    return read_shared(path, key)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_shared_cache(directory=None):
+    """DatasetCache process-wide untuk dataset shared per directory"""
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = DatasetCache(loader=functools.partial(load_shared_dataset, directory=directory))
+        return _caches[directory]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish dataset dashboard sebagai file kolom memory-mapped")
+    parser.add_argument('source', nargs='?', default="main_data.csv")
+    parser.add_argument('--directory', help="Folder file shared, mis. /dev/shm (default: di samping CSV)")
+    args = parser.parse_args()
+
+    df, _ = load_shared_dataset(args.source, args.directory)
+    path = shared_path(args.source, args.directory)
+    print(f"{len(df):,} records di-publish ke {path} ({os.path.getsize(path) / 1024 ** 2:.1f} MB)")
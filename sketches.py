@@ -0,0 +1,213 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from aggregations import SpendingDistribution
+from data_loader import mix64
+
+# Dimensi sketch distinct count: cukup untuk semua filter dan rollup distinct di dashboard
+SKETCH_KEYS = ['tahun', 'time_period', 'nama_state']
+SKETCH_COLUMNS = ['order_id', 'customer_unique_id']
+DEFAULT_RELATIVE_ERROR = 0.02
+
+# Kunci periode sketch spending kalau semua periode hari dipilih
+ALL_PERIODS = 'Semua Periode'
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+def precision_for_error(relative_error):
+    """Precision HyperLogLog (jumlah register = 2^p) untuk standard error tertentu"""
+    registers = (1.04 / relative_error) ** 2
+    return min(max(math.ceil(math.log2(registers)), 4), 18)
+
+
+def _bit_length(values):
+    """Bit length uint64 secara vectorized (exact, tanpa pembulatan float)"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    high_bits = np.frexp(high)[1]
+    low_bits = np.frexp(low)[1]
+    return np.where(high > 0, 32 + high_bits, low_bits)
+
+
+def hash_values(series):
+    """Hash 64-bit untuk nilai ID (kode int64 dari schema atau string mentah)"""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        raw = series.to_numpy(dtype='int64').view(np.uint64)
+    else:
+        raw = pd.util.hash_pandas_object(series, index=False).to_numpy()
+    return mix64(raw)
+
+
+def register_updates(hashes, precision):
+    """Index register dan rank (posisi bit 1 pertama) untuk setiap hash"""
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - _bit_length(remainder) + 1
+    return index, rank.astype(np.uint8)
+
+
+def estimate_cardinality(registers):
+    """Estimasi HyperLogLog untuk satu array register (dengan koreksi linear counting)"""
+    m = registers.shape[-1]
+    if m == 16:
+        alpha = 0.673
+    elif m == 32:
+        alpha = 0.697
+    elif m == 64:
+        alpha = 0.709
+    else:
+        alpha = 0.7213 / (1 + 1.079 / m)
+
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where(small, linear, raw)
+
+
+def select_cells(cells, selected_year, selected_time_period):
+    """Mask cell sketch sesuai filter tahun dan periode waktu"""
+    mask = np.ones(len(cells), dtype=bool)
+    if selected_year != 'All Time':
+        mask &= (cells['tahun'] == selected_year).to_numpy()
+    if selected_time_period:
+        mask &= cells['time_period'].isin(selected_time_period).to_numpy()
+    return mask
+
+
+class DistinctSketches:
+    """Sketch HyperLogLog per cell (tahun, time_period, nama_state).
+
+    Register antar cell bisa di-merge dengan max, jadi distinct count untuk
+    filter apa pun dihitung dari state yang sudah ada tanpa scan ulang data.
+    """
+
+    def __init__(self, df, columns=SKETCH_COLUMNS, relative_error=DEFAULT_RELATIVE_ERROR):
+        self.precision = precision_for_error(relative_error)
+        self.relative_error = 1.04 / math.sqrt(1 << self.precision)
+        keys = [key for key in SKETCH_KEYS if key in df.columns]
+
+        # Satu baris per cell; ngroup() memberi nomor cell untuk setiap baris data
+        grouped = df.groupby(keys, observed=True, dropna=False, sort=True)
+        cell_ids = grouped.ngroup().to_numpy()
+        self.cells = grouped.size().reset_index(name='row_count')
+
+        m = 1 << self.precision
+        self.registers = {}
+        for col in columns:
+            # ID kosong tidak dihitung, sama seperti nunique()
+            present = df[col].notna().to_numpy()
+            hashes = hash_values(df[col][present])
+            register_index, rank = register_updates(hashes, self.precision)
+            flat = cell_ids[present] * m + register_index
+
+            # Ambil rank maksimum per (cell, register)
+            best = pd.Series(rank).groupby(flat).max()
+            registers = np.zeros(len(self.cells) * m, dtype=np.uint8)
+            registers[best.index.to_numpy()] = best.to_numpy()
+            self.registers[col] = registers.reshape(len(self.cells), m)
+
+    def select(self, selected_year, selected_time_period):
+        """Mask cell sesuai filter tahun dan periode waktu"""
+        return select_cells(self.cells, selected_year, selected_time_period)
+
+    def estimate(self, column, mask, by=None):
+        """Estimasi distinct count, total atau per satu dimensi cell"""
+        registers = self.registers[column][mask]
+        if by is None:
+            if len(registers) == 0:
+                return 0
+            return int(round(float(estimate_cardinality(registers.max(axis=0)))))
+
+        groups = self.cells.loc[mask, by]
+        estimates = {}
+        for value, positions in groups.groupby(groups, observed=True).indices.items():
+            merged = registers[positions].max(axis=0)
+            estimates[value] = int(round(float(estimate_cardinality(merged))))
+        return pd.Series(estimates, dtype='int64').rename_axis(by)
+
+
+class SpendingSketches:
+    """Sketch quantile spending per customer untuk setiap partisi filter.
+
+    Bucket logaritmik ala DDSketch: bucket i memuat nilai di (gamma^(i-1),
+    gamma^i], jadi quantile hasil estimasi punya error relatif maksimum
+    relative_accuracy. Total spending per customer tidak bisa di-merge antar
+    cell (customer yang sama akan terhitung dua kali), jadi sketch dibangun
+    dari total per customer di setiap partisi yang bisa dipilih filter:
+    tahun (atau All Time) x satu periode, semua periode, atau tanpa filter
+    periode. Kombinasi periode lain tidak punya sketch (lihat select).
+    """
+
+    def __init__(self, df, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+
+        # Customer kosong tidak dihitung, sama seperti fakta customer; filter periode
+        # (satu atau semua periode) tidak memuat baris tanpa periode
+        rows = df[df['customer_unique_id'].notna()]
+        timed = rows[rows['time_period'].notna()]
+        partitions = [
+            (rows, [], None), (rows, ['tahun'], None),
+            (timed, [], ALL_PERIODS), (timed, ['tahun'], ALL_PERIODS),
+            (timed, ['time_period'], None), (timed, ['tahun', 'time_period'], None),
+        ]
+
+        # Total spending per (partisi, customer); self.index: (tahun, periode) -> baris sketch
+        self.index = {}
+        cell_ids, values = [], []
+        for frame, by, period in partitions:
+            spending = frame.groupby(by + ['customer_unique_id'], observed=True)['price'].sum()
+            if by:
+                grouped = spending.index.droplevel('customer_unique_id').to_frame(index=False).groupby(
+                    by, observed=True, sort=False
+                )
+                ids = grouped.ngroup().to_numpy() + len(self.index)
+                labels = grouped.size().index
+            else:
+                ids = np.full(len(spending), len(self.index))
+                labels = [()]
+            for label in labels:
+                named = dict(zip(by, label if isinstance(label, tuple) else (label,)))
+                self.index[(named.get('tahun', 'All Time'), named.get('time_period', period))] = len(self.index)
+            cell_ids.append(ids)
+            values.append(spending.to_numpy(dtype='float64'))
+        cell_ids = np.concatenate(cell_ids)
+        values = np.concatenate(values)
+
+        # Bucket 0 untuk spending <= 0, bucket lain bergeser supaya index terkecil = 1
+        positive = values > 0
+        index = np.ceil(np.log(values[positive]) / np.log(self.gamma)).astype('int64')
+        self.offset = index.min() - 1 if len(index) else 0
+        buckets = np.zeros(len(values), dtype='int64')
+        buckets[positive] = index - self.offset
+
+        n_buckets = int(buckets.max()) + 1 if len(buckets) else 1
+        counts = np.bincount(cell_ids * n_buckets + buckets, minlength=len(self.index) * n_buckets)
+        self.counts = counts.reshape(len(self.index), n_buckets)
+
+        # Nilai representatif per bucket: titik tengah relatif rentang bucket
+        exponents = np.arange(n_buckets) + self.offset
+        self.bucket_values = np.where(np.arange(n_buckets) == 0, 0.0, 2 * self.gamma ** exponents / (self.gamma + 1))
+        self.periods = frozenset(timed['time_period'].unique())
+
+    def select(self, selected_year, selected_time_period):
+        """Sketch untuk filter tahun dan periode waktu, None kalau kombinasi periode tidak punya sketch"""
+        if not selected_time_period:
+            period = None
+        elif len(selected_time_period) == 1:
+            period = selected_time_period[0]
+        elif set(selected_time_period) >= self.periods:
+            period = ALL_PERIODS
+        else:
+            return None
+        return self.index.get((selected_year, period))
+
+    def distribution(self, sketch):
+        """Distribusi spending per customer dari satu sketch"""
+        counts = self.counts[sketch]
+        present = counts > 0
+        return SpendingDistribution(self.bucket_values[present], counts[present])
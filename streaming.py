@@ -0,0 +1,363 @@
+import glob
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregations import (
+    CUBE_MEASURES, MONTHLY_MEASURES, build_cube, build_monthly_cube, combine_partials, cube_keys,
+    filter_cells, first_orders, monthly_keys, repeat_segments, spending_segments
+)
+from data_loader import READ_DTYPES, DatasetCache, apply_schema, downcast_time_feature, preprocess
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500_000
+
+# Partial per chunk dikompaksi setiap sekian chunk supaya memory tetap terbatas
+COMPACT_EVERY = 8
+
+# Interval polling folder drop (detik)
+DEFAULT_POLL_INTERVAL = 30
+
+# Tabel aggregate selain cube: key dan fungsi aggregate per kolom
+AGGREGATE_TABLES = {
+    # Order unik per (tahun, periode, state): satu order hanya punya satu timestamp dan satu customer
+    'orders': (['tahun', 'time_period', 'nama_state'], {'order_count': 'sum'}),
+    'category_orders': (['tahun', 'time_period', 'product_category_name_english'], {'order_count': 'sum'}),
+    # Fakta customer per cell filter; first_row = baris pertama customer untuk nama_state 'first'
+    'customers': (
+        ['customer_unique_id', 'tahun', 'time_period', 'nama_state'],
+        {'total_spending': 'sum', 'order_count': 'sum', 'first_row': 'min'}
+    )
+}
+
+
+def known_orders(runs, ids):
+    """Mask order_id yang sudah ada di salah satu array terurut runs"""
+    found = np.zeros(len(ids), dtype=bool)
+    for run in runs:
+        if len(run) == 0:
+            continue
+        pos = np.minimum(np.searchsorted(run, ids), len(run) - 1)
+        found |= run[pos] == ids
+    return found
+
+
+def table_spec(name, table):
+    """Key dan fungsi aggregate untuk satu tabel aggregate"""
+    if name == 'cube':
+        return cube_keys(table), {col: 'sum' for col in CUBE_MEASURES}
+    if name == 'monthly':
+        return monthly_keys(table), {col: 'sum' for col in MONTHLY_MEASURES}
+    return AGGREGATE_TABLES[name]
+
+
+def chunk_partials(chunk, known):
+    """Aggregate parsial satu chunk yang sudah di-preprocess"""
+    partials = {'cube': build_cube(chunk), 'monthly': build_monthly_cube(chunk, known)}
+
+    for name, (keys, aggs) in AGGREGATE_TABLES.items():
+        if not set(keys).issubset(chunk.columns):
+            continue  # kolom kategori produk tidak ada di data
+
+        if name == 'customers':
+            # Sama seperti groupby customer_unique_id: customer kosong tidak dihitung
+            has_customer = chunk['customer_unique_id'].notna().to_numpy()
+            rows = chunk[has_customer]
+            table = rows[keys].assign(
+                total_spending=rows['price'].astype('float64'),
+                order_count=first_orders(rows, keys, known[has_customer]),
+                first_row=rows['row'].to_numpy()
+            )
+        else:
+            table = chunk[keys].assign(order_count=first_orders(chunk, keys, known))
+        partials[name] = combine_partials([table], keys, aggs)
+    return partials
+
+
+class AggregateSnapshot:
+    """Satu versi aggregate streaming yang read-only.
+
+    Dashboard memegang satu snapshot per run, jadi semua view melihat versi
+    data yang sama walaupun append sedang berjalan di thread lain.
+    """
+
+    def __init__(self, tables, n_rows, version):
+        self.tables = tables
+        self.n_rows = n_rows
+        self.version = version
+
+    @property
+    def cube(self):
+        return self.tables['cube']
+
+    @property
+    def monthly_cube(self):
+        return self.tables['monthly']
+
+    def distinct_count(self, column, selected_year, selected_time_period, by=None):
+        """Distinct count exact untuk filter, total atau per satu dimensi"""
+        if column == 'order_id':
+            orders = filter_cells(self.tables['orders'], selected_year, selected_time_period)
+            if by is None:
+                return int(orders['order_count'].sum())
+            return orders.groupby(by, observed=True)['order_count'].sum()
+
+        customers = filter_cells(self.tables['customers'], selected_year, selected_time_period)
+        if by is None:
+            return customers['customer_unique_id'].nunique()
+        return customers.groupby(by, observed=True)['customer_unique_id'].nunique()
+
+    def customer_facts(self, selected_year, selected_time_period):
+        """Tabel fakta per customer untuk filter, kolom sama dengan build_customer_facts.
+
+        order_count dijumlahkan dari semua cell dan semua append, jadi segment
+        repeat purchase selalu memakai jumlah order kumulatif customer.
+        """
+        cells = filter_cells(self.tables['customers'], selected_year, selected_time_period)
+        cells = cells.sort_values('first_row', kind='stable')
+        facts = cells.groupby('customer_unique_id').agg(
+            total_spending=('total_spending', 'sum'),
+            order_count=('order_count', 'sum'),
+            nama_state=('nama_state', 'first')
+        )
+        facts['spending_segment'] = spending_segments(facts['total_spending'].to_numpy())
+        facts['repeat_segment'] = repeat_segments(facts['order_count'].to_numpy())
+        return facts.reset_index()
+
+    def category_order_counts(self, selected_year, selected_time_period):
+        """Jumlah order unik per kategori produk untuk filter"""
+        orders = filter_cells(self.tables['category_orders'], selected_year, selected_time_period)
+        return orders.groupby('product_category_name_english', observed=True)['order_count'].sum()
+
+
+class StreamingAggregates:
+    """Struktur aggregate dashboard yang dibangun dari CSV per chunk.
+
+    Frame mentah tidak pernah disimpan: setiap chunk langsung dilipat ke cube,
+    aggregate bulanan, tabel order unik dan tabel fakta customer per cell
+    filter. Memory terbatas pada ukuran chunk ditambah ukuran aggregate
+    (termasuk index order_id ter-encode, 8 byte per order).
+
+    Baris baru dilipat lewat append dan dipublikasikan sebagai snapshot dengan
+    versi naik satu. Append yang gagal tidak mengubah snapshot.
+    """
+
+    def __init__(self):
+        self.snapshot = AggregateSnapshot({}, 0, 0)
+        self.order_ids = np.empty(0, dtype='int64')
+        self._lock = threading.Lock()
+        self._reset_working()
+
+    def _reset_working(self):
+        """Mulai state kerja dari snapshot yang terakhir dipublikasikan"""
+        self._tables = self.snapshot.tables
+        self._rows = self.snapshot.n_rows
+        self._order_runs = [self.order_ids]
+        self._partials = {}
+        self._pending_chunks = 0
+
+    @property
+    def n_rows(self):
+        return self.snapshot.n_rows
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    def add_chunk(self, raw):
+        """Preprocess satu chunk CSV mentah dan lipat ke state kerja"""
+        if len(raw) == 0:
+            return
+        # Schema sama dengan mode in-memory: categories urut alfabet, ID ter-encode
+        chunk = apply_schema(preprocess(raw))
+        chunk['row'] = np.arange(self._rows, self._rows + len(chunk))
+
+        # Order kosong tidak ikut dicocokkan atau disimpan sebagai order (tidak jadi satu order "0")
+        has_order = chunk['order_id'].notna().to_numpy()
+        ids = chunk['order_id'][has_order].to_numpy(dtype='int64')
+        known = np.zeros(len(chunk), dtype=bool)
+        known[has_order] = known_orders(self._order_runs, ids)
+
+        for name, table in chunk_partials(chunk, known).items():
+            self._partials.setdefault(name, []).append(table)
+        self._order_runs.append(np.unique(ids[~known[has_order]]))
+        self._rows += len(chunk)
+        self._pending_chunks += 1
+        if self._pending_chunks >= COMPACT_EVERY:
+            self.compact()
+
+    def compact(self):
+        """Gabungkan semua partial menjadi satu tabel per aggregate (belum dipublikasikan)"""
+        tables = dict(self._tables)
+        for name, partials in self._partials.items():
+            frames = ([tables[name]] if name in tables else []) + partials
+            keys, aggs = table_spec(name, frames[0])
+
+            table = combine_partials(frames, keys, aggs)
+            for col in ('tahun', 'bulan'):
+                if col in table.columns:
+                    table[col] = downcast_time_feature(table[col])
+            tables[name] = table
+        self._tables = tables
+
+        # Run order_id saling disjoint dan masing-masing terurut: sort stable cukup me-merge run
+        order_ids = np.concatenate(self._order_runs)
+        order_ids.sort(kind='stable')
+        self._order_runs = [order_ids]
+        self._partials = {}
+        self._pending_chunks = 0
+
+    def append(self, chunks):
+        """Lipat iterable chunk mentah ke aggregate dan publikasikan snapshot versi baru.
+
+        Kembalikan jumlah baris baru. Kalau ada chunk yang gagal, semua chunk
+        dari append ini dibuang dan snapshot lama tetap dipakai.
+        """
+        with self._lock:
+            try:
+                for raw in chunks:
+                    self.add_chunk(raw)
+                self.compact()
+            except BaseException:
+                self._reset_working()
+                raise
+
+            added = self._rows - self.snapshot.n_rows
+            self.order_ids = self._order_runs[0]
+            self.snapshot = AggregateSnapshot(self._tables, self._rows, self.snapshot.version + 1)
+            return added
+
+    def append_csv(self, data_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Append semua baris sebuah CSV (misalnya order harian) sebagai satu versi baru"""
+        return self.append(read_order_chunks(data_path, chunk_size))
+
+
+def read_order_chunks(data_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Baca CSV per chunk tanpa memotong item satu order ke dua chunk.
+
+    Baris order terakhir di setiap chunk ditahan ke chunk berikutnya, jadi
+    order unik per kategori tetap exact selama item satu order berurutan di file.
+    """
+    carry = None
+    for chunk in pd.read_csv(data_path, dtype=READ_DTYPES, chunksize=chunk_size):
+        if carry is not None:
+            # Categories carry dan chunk bisa berbeda; concat membuatnya string, jadi cast ulang
+            chunk = pd.concat([carry, chunk], ignore_index=True).astype(READ_DTYPES)
+        tail = (chunk['order_id'] == chunk['order_id'].iloc[-1]).to_numpy()
+        carry = chunk[tail]
+        yield chunk[~tail]
+    if carry is not None:
+        yield carry
+
+
+def ingest_csv(data_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Bangun StreamingAggregates dari CSV yang dibaca per chunk"""
+    aggregates = StreamingAggregates()
+    aggregates.append(read_order_chunks(data_path, chunk_size))
+    return aggregates
+
+
+# Cache aggregate streaming process-wide, di-key dengan versi file seperti dataset_cache
+streaming_cache = DatasetCache(loader=ingest_csv)
+
+
+class DropDirectoryWatcher:
+    """Polling folder drop: setiap CSV baru di-append ke aggregate streaming data_path.
+
+    File diproses berurutan nama. Sebelum di-append, file diklaim dengan
+    rename ke subfolder processing/, lalu dipindah ke processed/ (atau
+    failed/ kalau gagal dibaca); file yang sudah diklaim tidak pernah
+    di-append lagi walaupun pemindahan berikutnya gagal. File yang belum
+    bisa diklaim (terkunci, permission) dilewati dan dicoba lagi di polling
+    berikutnya tanpa menahan file lain.
+    Penulis file sebaiknya menulis ke nama sementara lalu rename ke *.csv.
+    Kalau data_path sendiri diganti, aggregate dibangun ulang dari file baru
+    dan file yang sudah di-append tidak diulang.
+    """
+
+    def __init__(self, data_path, directory, interval=DEFAULT_POLL_INTERVAL, cache=streaming_cache):
+        self.data_path = data_path
+        self.directory = directory
+        self.interval = interval
+        self.cache = cache
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def pending_files(self):
+        return sorted(glob.glob(os.path.join(self.directory, '*.csv')))
+
+    def _move(self, path, subdir):
+        target_dir = os.path.join(self.directory, subdir)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(path))
+        os.replace(path, target)
+        return target
+
+    def poll(self):
+        """Append semua file yang menunggu di folder drop, kembalikan jumlah baris baru"""
+        added = 0
+        for path in self.pending_files():
+            aggregates, _ = self.cache.get(self.data_path)
+            try:
+                claimed = self._move(path, 'processing')
+            except OSError as e:  # file hilang atau terkunci, dicoba lagi di polling berikutnya
+                logger.warning("File drop %s belum bisa diklaim: %s", path, e)
+                self.last_error = (path, e)
+                continue
+
+            try:
+                added += aggregates.append_csv(claimed)
+                subdir = 'processed'
+            except Exception as e:
+                # File rusak tidak boleh menghentikan watcher: catat, pindahkan ke failed/, lanjut
+                logger.exception("File drop %s gagal di-append, dipindah ke failed/", path)
+                self.last_error = (path, e)
+                subdir = 'failed'
+
+            try:
+                self._move(claimed, subdir)
+            except OSError as e:  # tetap di processing/, tidak di-append ulang
+                logger.warning("File drop %s tidak bisa dipindah ke %s/: %s", claimed, subdir, e)
+                self.last_error = (claimed, e)
+        return added
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except OSError as e:  # file atau folder hilang sementara, coba lagi di polling berikutnya
+                logger.warning("Polling folder drop %s gagal: %s", self.directory, e)
+                self.last_error = (self.directory, e)
+            except Exception as e:  # thread watcher tetap hidup, polling berikutnya dicoba lagi
+                logger.exception("Polling folder drop %s gagal", self.directory)
+                self.last_error = (self.directory, e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='dashboard-drop-watcher')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def watch_drop_directory(data_path, directory, interval=DEFAULT_POLL_INTERVAL):
+    """Jalankan satu watcher per (data_path, folder drop) di proses ini"""
+    key = (os.path.abspath(data_path), os.path.abspath(directory))
+    with _watchers_lock:
+        if key not in _watchers:
+            _watchers[key] = DropDirectoryWatcher(data_path, directory, interval).start()
+        return _watchers[key]
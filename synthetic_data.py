@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import mix64
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # output parquet dinonaktifkan tanpa pyarrow
+    pa = None
+    pq = None
+
+# Kolom yang dibutuhkan load_data dan semua render method, urutan sama dengan main_data.csv
+COLUMNS = [
+    'order_id',
+    'customer_unique_id',
+    'customer_state',
+    'order_purchase_timestamp',
+    'price',
+    'review_score',
+    'product_category_name_english'
+]
+
+# Proporsi customer per state (mendekati dataset Olist: SP dominan, utara sangat kecil)
+STATE_WEIGHTS = {
+    'SP': 42.0, 'RJ': 12.9, 'MG': 11.7, 'RS': 5.5, 'PR': 5.1, 'SC': 3.7, 'BA': 3.4,
+    'DF': 2.2, 'ES': 2.0, 'GO': 2.0, 'PE': 1.7, 'CE': 1.3, 'PA': 1.0, 'MT': 0.9,
+    'MA': 0.75, 'MS': 0.7, 'PB': 0.55, 'PI': 0.5, 'RN': 0.5, 'AL': 0.4, 'SE': 0.35,
+    'TO': 0.3, 'RO': 0.25, 'AM': 0.15, 'AC': 0.08, 'AP': 0.07, 'RR': 0.05
+}
+
+# Kategori diurutkan dari yang paling laku; bobot Zipf menghasilkan long tail
+CATEGORIES = [
+    'bed_bath_table', 'health_beauty', 'sports_leisure', 'furniture_decor', 'computers_accessories',
+    'housewares', 'watches_gifts', 'telephony', 'garden_tools', 'auto', 'toys', 'cool_stuff',
+    'perfumery', 'baby', 'electronics', 'stationery', 'fashion_bags_accessories', 'pet_shop',
+    'office_furniture', 'consoles_games', 'luggage_accessories', 'construction_tools_construction',
+    'home_appliances', 'musical_instruments', 'small_appliances', 'home_construction',
+    'books_general_interest', 'food', 'furniture_living_room', 'home_confort', 'drinks', 'audio',
+    'market_place', 'construction_tools_lights', 'air_conditioning', 'food_drink',
+    'industry_commerce_and_business', 'books_technical', 'fixed_telephony', 'art', 'fashion_shoes',
+    'agro_industry_and_commerce', 'signaling_and_security', 'christmas_supplies',
+    'fashion_male_clothing', 'books_imported', 'dvds_blu_ray', 'music', 'tablets_printing_image',
+    'party_supplies', 'fashion_childrens_clothes', 'diapers_and_hygiene', 'flowers',
+    'arts_and_craftmanship', 'furniture_mattress_and_upholstery', 'la_cuisine', 'cds_dvds_musicals',
+    'fashion_sport', 'home_comfort_2', 'security_and_services'
+]
+CATEGORY_ZIPF_EXPONENT = 0.8
+MISSING_CATEGORY_RATE = 0.014
+
+# Review per order; 0 = order tanpa review (diperlakukan khusus oleh dashboard)
+REVIEW_SCORES = np.array([0, 1, 2, 3, 4, 5])
+REVIEW_WEIGHTS = np.array([0.008, 0.114, 0.032, 0.082, 0.191, 0.573])
+
+# Distribusi jam pembelian: sepi dini hari, ramai siang sampai malam
+HOUR_WEIGHTS = np.array([
+    2.4, 1.1, 0.5, 0.3, 0.2, 0.2, 0.5, 1.2, 3.0, 4.8, 6.2, 6.6,
+    6.0, 6.5, 6.8, 6.6, 6.5, 6.2, 5.8, 5.8, 6.3, 6.3, 5.9, 4.6
+])
+
+PRICE_LOG_MEAN = 4.3  # median harga dasar ~R$ 74, dikali pengali per kategori
+PRICE_LOG_SIGMA = 0.9
+ITEM_PROBABILITY = 0.89  # jumlah item per order ~ geometric, rata-rata ~1.12
+DEFAULT_REPEAT_RATE = 0.035  # peluang sebuah order dibuat customer lama
+ORDER_GROWTH = 1.8  # volume order naik dari awal ke akhir periode
+DEFAULT_START = '2016-09-01'
+DEFAULT_END = '2018-08-31'
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Salt hash supaya ID order, ID customer dan state tidak saling berkorelasi
+_ORDER_SALT = 0x6F72646572
+_CUSTOMER_SALT = 0x637573746F6D6572
+_STATE_SALT = 0x7374617465
+_HEX_TABLE = np.array([f"{i:02x}" for i in range(256)], dtype='S2')
+
+
+def _hash_index(index, seed, salt):
+    """Hash 64-bit deterministik untuk index integer"""
+    return mix64(mix64(index.astype(np.uint64) ^ np.uint64(salt)) ^ np.uint64(seed & 0xFFFFFFFFFFFFFFFF))
+
+
+def hex_ids(index, seed, salt):
+    """ID hex 32 karakter (format Olist) dari index integer"""
+    high = _hash_index(index, seed, salt)
+    low = mix64(high ^ np.uint64(salt))
+    raw = np.stack([high, low], axis=1).astype('>u8').view(np.uint8)
+    return _HEX_TABLE[raw].view('S32').ravel().astype(str)
+
+
+def customer_states(customer_index, seed):
+    """State tetap per customer, mengikuti STATE_WEIGHTS"""
+    states = np.array(list(STATE_WEIGHTS))
+    weights = np.array(list(STATE_WEIGHTS.values()))
+    cumulative = np.cumsum(weights) / weights.sum()
+    uniform = (_hash_index(customer_index, seed, _STATE_SALT) >> np.uint64(11)) / float(1 << 53)
+    return states[np.minimum(np.searchsorted(cumulative, uniform, side='right'), len(states) - 1)]
+
+
+def category_profile(seed):
+    """Bobot Zipf dan pengali harga per kategori (deterministik per seed)"""
+    ranks = np.arange(1, len(CATEGORIES) + 1)
+    weights = ranks ** -CATEGORY_ZIPF_EXPONENT
+    weights = weights / weights.sum() * (1 - MISSING_CATEGORY_RATE)
+    price_factor = np.random.default_rng([seed, len(CATEGORIES)]).lognormal(0, 0.5, len(CATEGORIES))
+    return weights, price_factor
+
+
+def generate_chunks(n_rows, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, start=DEFAULT_START, end=DEFAULT_END,
+                    repeat_rate=DEFAULT_REPEAT_RATE):
+    """Generator frame sintetis berbentuk data Olist, satu chunk (maksimal chunk_size baris) per iterasi.
+
+    Hasil deterministik untuk seed dan chunk_size yang sama. Setiap baris
+    adalah satu item order; item dalam satu order berbagi customer, timestamp
+    dan review. Hanya satu chunk yang ada di memory pada satu waktu.
+    """
+    rng = np.random.default_rng(seed)
+    category_weights, price_factor = category_profile(seed)
+    hour_weights = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+
+    start = pd.Timestamp(start)
+    span_days = (pd.Timestamp(end) - start).days + 1
+    expected_orders = max(n_rows * ITEM_PROBABILITY, 1)
+
+    rows_left = n_rows
+    next_order = 0
+    n_customers = 0
+    while rows_left > 0:
+        chunk_rows = min(chunk_size, rows_left)
+        n_orders = chunk_rows
+        order_index = np.arange(next_order, next_order + n_orders, dtype=np.int64)
+
+        # Customer: sebagian order dari customer lama (condong ke customer awal), sisanya customer baru
+        is_repeat = rng.random(n_orders) < repeat_rate
+        is_repeat[:1] &= n_customers > 0
+        new_customers = np.cumsum(~is_repeat)
+        known_before = n_customers + new_customers - (~is_repeat)
+        repeat_pick = np.floor(known_before * rng.random(n_orders) ** 2).astype(np.int64)
+        customer_index = np.where(is_repeat, repeat_pick, n_customers + new_customers - 1)
+
+        # Timestamp: volume naik seiring waktu, jam mengikuti pola harian
+        position = np.minimum((order_index + rng.random(n_orders)) / expected_orders, 1.0)
+        days = np.floor(position ** (1 / ORDER_GROWTH) * (span_days - 1)).astype(np.int64)
+        seconds = (
+            days * 86400
+            + rng.choice(24, n_orders, p=hour_weights) * 3600
+            + rng.integers(0, 3600, n_orders)
+        )
+        timestamps = start + pd.to_timedelta(seconds, unit='s')
+
+        review = rng.choice(REVIEW_SCORES, n_orders, p=REVIEW_WEIGHTS)
+
+        # Item per order, lalu potong di batas chunk
+        items = rng.geometric(ITEM_PROBABILITY, n_orders)
+        order_rows = np.repeat(np.arange(n_orders), items)[:chunk_rows]
+        n_items = len(order_rows)
+
+        category_code = rng.choice(len(CATEGORIES) + 1, n_items, p=np.append(category_weights, MISSING_CATEGORY_RATE))
+        has_category = category_code < len(CATEGORIES)
+        category = pd.Categorical.from_codes(np.where(has_category, category_code, -1), categories=CATEGORIES)
+
+        factor = np.where(has_category, price_factor[np.minimum(category_code, len(CATEGORIES) - 1)], 1.0)
+        price = np.round(rng.lognormal(PRICE_LOG_MEAN, PRICE_LOG_SIGMA, n_items) * factor, 2)
+        price = np.maximum(price, 0.85)
+
+        chunk_customers = customer_index[order_rows]
+        yield pd.DataFrame({
+            'order_id': hex_ids(order_index[order_rows], seed, _ORDER_SALT),
+            'customer_unique_id': hex_ids(chunk_customers, seed, _CUSTOMER_SALT),
+            'customer_state': customer_states(chunk_customers, seed),
+            'order_purchase_timestamp': timestamps[order_rows],
+            'price': price,
+            'review_score': review[order_rows],
+            'product_category_name_english': category
+        }, columns=COLUMNS)
+
+        used_orders = order_rows[-1] + 1 if n_items else 0
+        next_order += used_orders
+        n_customers = max(n_customers, int(customer_index[:used_orders].max()) + 1) if used_orders else n_customers
+        rows_left -= n_items
+
+
+def write_dataset(path, n_rows, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+    """Tulis data sintetis ke CSV atau Parquet secara streaming (format dari ekstensi path)"""
+    chunks = generate_chunks(n_rows, seed=seed, chunk_size=chunk_size, **kwargs)
+    extension = os.path.splitext(path)[1].lower()
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+
+    try:
+        if extension == '.csv':
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        elif extension == '.parquet':
+            if pq is None:
+                raise ImportError("Output parquet membutuhkan pyarrow")
+            writer = None
+            try:
+                for chunk in chunks:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            raise ValueError(f"Format output tidak didukung: {extension} (pakai .csv atau .parquet)")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate data sintetis berbentuk Olist untuk uji skala")
+    parser.add_argument('output', help="File output (.csv atau .parquet)")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Jumlah baris (item order)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Baris per chunk di memory")
+    parser.add_argument('--repeat-rate', type=float, default=DEFAULT_REPEAT_RATE,
+                        help="Peluang sebuah order berasal dari customer lama")
+    args = parser.parse_args()
+
+    write_dataset(args.output, args.rows, seed=args.seed, chunk_size=args.chunk_size, repeat_rate=args.repeat_rate)
+    print(f"{args.rows:,} baris sintetis ditulis ke {args.output}")